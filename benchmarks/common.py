@@ -0,0 +1,28 @@
+"""Общая подготовка окружения для скриптов замеров."""
+import os
+import sys
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+
+def setup_django(db_name):
+    """Настраивает Django на отдельную базу SQLite db_name"""
+    from django.conf import settings
+    settings.DATABASES['default']['NAME'] = db_name
+    import django
+    django.setup()
+
+
+def migrate(target=None):
+    """Применяет все миграции или откатывает posts до target"""
+    from django.core.management import call_command
+    args = ['posts', target] if target else []
+    call_command('migrate', *args, verbosity=0)
+
+
+def seed(**options):
+    """Заполняет базу командой seed_bench"""
+    from django.core.management import call_command
+    call_command('seed_bench', **options)
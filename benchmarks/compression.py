@@ -0,0 +1,138 @@
+"""
+Размер ответов на проводе и время минификации и сжатия.
+
+Скрипт создаёт временную базу SQLite, заполняет её командой seed_bench
+и получает тестовым клиентом Django страницы лент без минификации.
+Для каждой страницы печатается размер исходной разметки, после
+минификации и после сжатия gzip разных уровней (и br при установленном
+brotli), а также время минификации и сжатия одной страницы.
+Для потока ndjson сравнивается сжатие целиком и по частям
+с разным COMPRESS_STREAM_FLUSH_SIZE.
+
+Запуск из корня репозитория:
+    python benchmarks/compression.py --posts 20000 --repeat 50
+"""
+import argparse
+import gzip
+import os
+import tempfile
+import time
+
+from common import migrate, seed, setup_django
+
+
+def measure(function, data, repeat):
+    """Результат функции и среднее время вызова в мс"""
+    result = function(data)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function(data)
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def get_pages():
+    from django.contrib.auth import get_user_model
+    from django.urls import reverse
+    from posts.models import Group, Post
+
+    author = get_user_model().objects.order_by('pk').first()
+    return {
+        'index': reverse('posts:index'),
+        'group_list': reverse(
+            'posts:group_list', args=[Group.objects.first().slug]
+        ),
+        'profile': reverse('posts:profile', args=[author.username]),
+        'post_detail': reverse(
+            'posts:post_detail', args=[Post.objects.order_by('pk').first().pk]
+        ),
+    }
+
+
+def get_codecs():
+    """Название и функция сжатия для каждого варианта из таблицы"""
+    from core.static import brotli
+
+    def gzip_level(level):
+        return lambda data: gzip.compress(data, level, mtime=0)
+
+    def brotli_quality(quality):
+        return lambda data: brotli.compress(data, quality=quality)
+
+    codecs = [
+        ('gzip-{}'.format(level), gzip_level(level)) for level in (1, 6, 9)
+    ]
+    if brotli is not None:
+        codecs += [
+            ('br-{}'.format(quality), brotli_quality(quality))
+            for quality in (5, 11)
+        ]
+    return codecs
+
+
+def compare_pages(client, repeat):
+    from django.test import override_settings
+    from core.compression import minify_html
+
+    row = '{:<12} {:<14} {:>9} {:>9}'
+    print(row.format('страница', 'вариант', 'байт', 'мс'))
+    for name, url in get_pages().items():
+        with override_settings(HTML_MINIFY=False):
+            raw = client.get(url).content
+        minified, elapsed = measure(
+            lambda data: minify_html(data.decode()).encode(), raw, repeat
+        )
+        print(row.format(name, 'исходный', len(raw), ''))
+        print(row.format('', 'minify', len(minified), round(elapsed, 3)))
+        for codec, compress in get_codecs():
+            for label, data in (('', raw), ('+minify', minified)):
+                compressed, elapsed = measure(compress, data, repeat)
+                print(row.format(
+                    '', codec + label, len(compressed), round(elapsed, 3)
+                ))
+
+
+def compare_stream(client):
+    from django.test import override_settings
+    from django.urls import reverse
+    from core.compression import compress_stream
+
+    url = reverse('api:posts')
+    lines = list(client.get(url, {'format': 'ndjson'}).streaming_content)
+    body = b''.join(lines)
+    print()
+    print('ndjson: {} строк, {} байт, gzip целиком: {} байт'.format(
+        len(lines), len(body), len(gzip.compress(body, 6, mtime=0))
+    ))
+    print('{:>12} {:>9} {:>9} {:>9}'.format(
+        'flush, байт', 'частей', 'байт', 'мс'
+    ))
+    for flush_size in (1, 1024, 16 * 1024, 256 * 1024):
+        with override_settings(COMPRESS_STREAM_FLUSH_SIZE=flush_size):
+            started = time.perf_counter()
+            chunks = list(compress_stream(iter(lines), 'gzip'))
+            elapsed = (time.perf_counter() - started) * 1000
+        print('{:>12} {:>9} {:>9} {:>9.1f}'.format(
+            flush_size, len(chunks), sum(map(len, chunks)), elapsed
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from django.test import Client
+
+        migrate()
+        seed(users=args.users, posts=args.posts, comments=args.comments)
+        client = Client()
+        compare_pages(client, args.repeat)
+        compare_stream(client)
+
+
+if __name__ == '__main__':
+    main()
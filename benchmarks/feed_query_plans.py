@@ -0,0 +1,116 @@
+"""
+Планы и время запросов лент до и после индексов миграций 0011 и 0015.
+
+Скрипт создаёт временную базу SQLite, заполняет её постами,
+комментариями и подписками, выполняет запросы index, group_posts,
+profile, follow_index и списка комментариев post_detail на текущей
+схеме без индексов лент и с ними и печатает EXPLAIN QUERY PLAN
+и медианное время каждого запроса. Индексы лент — операции AddIndex
+миграций FEED_INDEX_MIGRATIONS: для замера «до» они удаляются,
+затем создаются снова, остальная схема не меняется.
+
+Запуск из корня репозитория:
+    python benchmarks/feed_query_plans.py --posts 200000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from importlib import import_module
+
+from common import migrate, seed, setup_django
+
+PAGE_SIZE = 10
+
+FEED_INDEX_MIGRATIONS = ['0011_feed_indexes', '0015_timelineentry_pub_date']
+
+
+def feed_indexes():
+    """Модель и индекс из каждой операции AddIndex миграций лент"""
+    from django.apps import apps
+    from django.db.migrations import AddIndex
+
+    for name in FEED_INDEX_MIGRATIONS:
+        migration = import_module('posts.migrations.' + name).Migration
+        for operation in migration.operations:
+            if isinstance(operation, AddIndex):
+                model = apps.get_model('posts', operation.model_name)
+                yield model, operation.index
+
+
+def set_feed_indexes(enabled):
+    """Создаёт или удаляет индексы лент на текущей схеме"""
+    from django.db import connection
+
+    with connection.schema_editor() as editor:
+        for model, index in feed_indexes():
+            if enabled:
+                editor.add_index(model, index)
+            else:
+                editor.remove_index(model, index)
+
+
+def feed_queries():
+    """Запросы лент в том виде, в каком их выполняют представления"""
+    from django.contrib.auth import get_user_model
+    from posts.models import Comment, Follow, Group, Post
+    from posts.timeline import TIMELINE_ORDERING, get_timeline_entries
+
+    User = get_user_model()
+    ordering = ('-pub_date', '-pk')
+    reader = User.objects.order_by('pk').first()
+    author = User.objects.get(pk=Follow.objects.filter(
+        user=reader
+    ).values_list('author', flat=True).first())
+    group = Group.objects.order_by('pk').first()
+    post = Post.objects.filter(comments__isnull=False).first()
+    return {
+        'index': Post.objects.for_feed().order_by(*ordering),
+        'group_posts': group.posts.for_feed().order_by(*ordering),
+        'profile': author.posts.for_feed().order_by(*ordering),
+        'follow_index': get_timeline_entries(reader).order_by(
+            *TIMELINE_ORDERING
+        ),
+        'post_detail comments': Comment.objects.filter(post=post),
+    }
+
+
+def measure(queryset, repeat):
+    timings = []
+    for i in range(repeat):
+        started = time.perf_counter()
+        list(queryset[:PAGE_SIZE])
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def report(title, repeat):
+    print('=' * 70)
+    print(title)
+    print('=' * 70)
+    for name, queryset in feed_queries().items():
+        print('{}: {:.2f} мс'.format(name, measure(queryset, repeat)))
+        for line in queryset[:PAGE_SIZE].explain().splitlines():
+            print('    ' + line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        migrate()
+        seed(users=max(args.posts // 50, 10), posts=args.posts,
+             comments=args.posts, follows=50, seed=args.seed)
+        set_feed_indexes(False)
+        report('Без индексов лент', args.repeat)
+        set_feed_indexes(True)
+        report('С индексами лент', args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Размер и время отрисовки навигации по страницам ленты.
+
+Скрипт отрисовывает posts/includes/paginator.html для страницы из
+середины ленты с разным числом страниц и сравнивает его с прежней
+навигацией, где ссылка выводилась на каждую страницу. База не нужна:
+пагинатор строится по range.
+
+Запуск из корня репозитория:
+    python benchmarks/paginator_render.py --pages 1000 20000 200000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import setup_django
+
+
+# Прежний цикл по всем страницам из paginator.html
+FULL_RANGE_TEMPLATE = '''
+{% for i in page_obj.paginator.page_range %}
+  {% if page_obj.number == i %}
+    <li class="page-item active">
+      <span class="page-link">{{ i }}</span>
+    </li>
+  {% else %}
+    <li class="page-item">
+      <a class="page-link" href="?{{ page_query }}page={{ i }}">{{ i }}</a>
+    </li>
+  {% endif %}
+{% endfor %}
+'''
+
+
+def measure(render, repeat):
+    """Размер разметки в байтах и среднее время отрисовки в мс"""
+    html = render()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        render()
+    elapsed = (time.perf_counter() - started) / repeat
+    return len(html.encode()), elapsed * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--pages', type=int, nargs='+', default=[1000, 20000, 200000]
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from django.template import engines
+        from django.template.loader import render_to_string
+        from core.paginator import ElidedPaginator
+
+        full_range = engines.all()[0].from_string(FULL_RANGE_TEMPLATE)
+        print('{:>9} {:>14} {:>12} {:>14} {:>12}'.format(
+            'страниц', 'все, байт', 'все, мс', 'сокр., байт', 'сокр., мс'
+        ))
+        for pages in args.pages:
+            paginator = ElidedPaginator(range(pages * 10), 10)
+            context = {'page_obj': paginator.page(pages // 2)}
+            full_size, full_time = measure(
+                lambda: full_range.render(context), args.repeat
+            )
+            elided_size, elided_time = measure(
+                lambda: render_to_string(
+                    'posts/includes/paginator.html', context
+                ),
+                args.repeat
+            )
+            print('{:>9} {:>14} {:>12.2f} {:>14} {:>12.2f}'.format(
+                pages, full_size, full_time, elided_size, elided_time
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Задержка и число SQL-запросов представлений posts.urls.
+
+Скрипт создаёт временную базу SQLite, заполняет её командой seed_bench
+и для каждого имени URL из posts.urls выполняет серию запросов тестовым
+клиентом Django от имени пользователя с подписками. Для каждого
+представления печатаются p50 и p99 задержки и число SQL-запросов.
+Сеть и внешние сервисы не нужны.
+
+Запуск из корня репозитория:
+    python benchmarks/views_latency.py --posts 100000 --requests 200
+    python benchmarks/views_latency.py --cold   # с очисткой кеша
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from common import migrate, seed, setup_django
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу"""
+    ordered = sorted(values)
+    rank = round(percent / 100 * (len(ordered) - 1))
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def build_scenarios(rnd):
+    """
+    Запрос для каждого имени URL posts.
+    Значение — функция без аргументов, возвращающая (метод, адрес, данные).
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import Max, Min
+    from django.urls import reverse
+    from posts.models import Follow, Group, Post
+    from posts.utils import COMMENTS_PER_PAGE, get_comment_paginator
+
+    User = get_user_model()
+    reader = User.objects.get(pk=Follow.objects.values_list(
+        'user', flat=True
+    ).order_by('user').first())
+    authors = list(User.objects.exclude(pk=reader.pk).values_list(
+        'username', flat=True
+    )[:1000])
+    slugs = list(Group.objects.values_list('slug', flat=True))
+    bounds = Post.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    own_posts = list(reader.posts.values_list('pk', flat=True)[:100])
+    if not own_posts:
+        own_posts = [Post.objects.create(author=reader, text='Пост').pk]
+    # Подгрузка комментариев идёт со второй страницы: первую выводит
+    # post_detail, поэтому запросы берут курсор после первой страницы
+    commented = Post.objects.filter(
+        comments_count__gt=COMMENTS_PER_PAGE
+    ).values_list('pk', flat=True)[:100]
+    comment_pages = [
+        reverse('posts:post_comments', args=[pk]) + '?cursor={}'.format(
+            get_comment_paginator(pk).first_page().next_cursor
+        )
+        for pk in commented
+    ] or [reverse('posts:post_comments', args=[bounds['low']])]
+
+    def page():
+        return '?page={}'.format(rnd.randint(1, 5))
+
+    def post_id():
+        return rnd.randint(bounds['low'], bounds['high'])
+
+    def author():
+        return rnd.choice(authors)
+
+    def search_query():
+        # Тексты seed_bench: «Пост N …» и «Комментарий N». Слово «пост»
+        # есть в каждом посте, число — в одном посте и комментарии
+        return rnd.choice(['пост', str(post_id())])
+
+    scenarios = {
+        'index': lambda: ('get', reverse('posts:index') + page(), None),
+        'group_list': lambda: ('get', reverse(
+            'posts:group_list', args=[rnd.choice(slugs)]
+        ) + page(), None),
+        'follow_index': lambda: (
+            'get', reverse('posts:follow_index') + page(), None
+        ),
+        'profile_follow': lambda: ('get', reverse(
+            'posts:profile_follow', args=[author()]
+        ), None),
+        'profile_unfollow': lambda: ('get', reverse(
+            'posts:profile_unfollow', args=[author()]
+        ), None),
+        'profile': lambda: ('get', reverse(
+            'posts:profile', args=[author()]
+        ) + page(), None),
+        'add_comment': lambda: ('post', reverse(
+            'posts:add_comment', args=[post_id()]
+        ), {'text': 'Комментарий замера'}),
+        'post_edit': lambda: ('get', reverse(
+            'posts:post_edit', args=[rnd.choice(own_posts)]
+        ), None),
+        'post_detail': lambda: ('get', reverse(
+            'posts:post_detail', args=[post_id()]
+        ), None),
+        'post_create': lambda: ('get', reverse('posts:post_create'), None),
+        'post_comments': lambda: ('get', rnd.choice(comment_pages), None),
+        'search': lambda: (
+            'get', reverse('posts:search'), {'q': search_query()}
+        ),
+    }
+    return reader, scenarios
+
+
+def run(client, request, requests, cold):
+    """Выполняет запросы сценария, возвращает задержки, запросы и статусы"""
+    from django.core.cache import cache
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings, queries, statuses = [], [], set()
+    for i in range(requests):
+        method, url, data = request()
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data or {})
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(captured.captured_queries))
+        statuses.add(response.status_code)
+    return timings, queries, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--follows', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument(
+        '--cold', action='store_true', help='Очищать кеш перед каждым запросом'
+    )
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(os.path.join(directory, 'bench.sqlite3'))
+        from django.test import Client
+        from posts.urls import urlpatterns
+
+        migrate()
+        seed(users=args.users, posts=args.posts, comments=args.comments,
+             follows=args.follows, seed=args.seed)
+        reader, scenarios = build_scenarios(random.Random(args.seed))
+        client = Client()
+        client.force_login(reader)
+        print('{:<18} {:>9} {:>9} {:>9} {:>9}  {}'.format(
+            'view', 'p50, мс', 'p99, мс', 'SQL p50', 'SQL max', 'статусы'
+        ))
+        for pattern in urlpatterns:
+            request = scenarios.get(pattern.name)
+            if request is None:
+                print('{:<18} нет сценария'.format(pattern.name))
+                continue
+            run(client, request, 1, args.cold)
+            timings, queries, statuses = run(
+                client, request, args.requests, args.cold
+            )
+            print('{:<18} {:>9.2f} {:>9.2f} {:>9} {:>9}  {}'.format(
+                pattern.name,
+                percentile(timings, 50),
+                percentile(timings, 99),
+                int(statistics.median(queries)),
+                max(queries),
+                ','.join(str(status) for status in sorted(statuses)),
+            ))
+
+
+if __name__ == '__main__':
+    main()
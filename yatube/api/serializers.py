@@ -0,0 +1,17 @@
+def serialize_post(post, request):
+    """Пост ленты в виде словаря для JSON"""
+    group = post.group
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': {
+            'username': post.author.username,
+            'name': post.author.get_full_name(),
+        },
+        'group': group and {'slug': group.slug, 'title': group.title},
+        'image': (
+            request.build_absolute_uri(post.image.url) if post.image else None
+        ),
+        'comments_count': post.comments_count,
+    }
@@ -0,0 +1,158 @@
+import json
+from http import HTTPStatus
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+
+class ApiViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.usr_author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.user = User.objects.create_user(username='auth_1')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [Post.objects.create(
+            author=cls.usr_author,
+            text='Тестовая запись {}'.format(i),
+            group=cls.group if i % 2 else None,
+        ) for i in range(13)]
+        Follow.objects.create(user=cls.user, author=cls.usr_author)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_json(self, client, url, **params):
+        response = client.get(url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'],
+                         'application/json; charset=utf-8')
+        return json.loads(response.content)
+
+    def test_feeds(self):
+        """Ленты отдают посты новыми первыми, как HTML-страницы"""
+        newest = self.posts[::-1]
+        feeds = {
+            reverse('api:posts'): newest,
+            reverse('api:group', args=['test-slug']): [
+                post for post in newest if post.group_id
+            ],
+            reverse('api:profile', args=['auth']): newest,
+            reverse('api:follow'): newest,
+        }
+        for url, expected in feeds.items():
+            with self.subTest(url=url):
+                data = self.get_json(self.authorized_client, url)
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [post.pk for post in expected[:10]]
+                )
+
+    def test_post_payload(self):
+        data = self.get_json(
+            self.guest_client, reverse('api:group', args=['test-slug']),
+            limit=1
+        )
+        post = self.posts[-2]
+        self.assertEqual(data['results'], [{
+            'id': post.pk,
+            'text': post.text,
+            'pub_date': post.pub_date.isoformat(),
+            'author': {'username': 'auth', 'name': 'Лев Толстой'},
+            'group': {'slug': 'test-slug', 'title': 'Тестовая группа'},
+            'image': None,
+            'comments_count': 0,
+        }])
+
+    def test_cursor_pagination(self):
+        """Курсоры next и previous обходят ленту без повторов"""
+        url = reverse('api:posts')
+        seen = []
+        data = self.get_json(self.guest_client, url, limit=5)
+        self.assertIsNone(data['previous'])
+        while True:
+            seen.extend(post['id'] for post in data['results'])
+            if data['next'] is None:
+                break
+            self.assertIn('limit=5', data['next'])
+            data = json.loads(self.guest_client.get(data['next']).content)
+        self.assertEqual(seen, [post.pk for post in self.posts[::-1]])
+        previous = json.loads(
+            self.guest_client.get(data['previous']).content
+        )
+        self.assertEqual(
+            [post['id'] for post in previous['results']], seen[5:10]
+        )
+
+    def test_first_page_without_count(self):
+        """Первая страница: сама выборка постов, без COUNT"""
+        with self.assertNumQueries(1):
+            self.guest_client.get(reverse('api:posts'))
+
+    def test_ndjson_stream(self):
+        """format=ndjson отдаёт всю ленту потоком, с курсора — остаток"""
+        url = reverse('api:posts')
+        response = self.guest_client.get(url, {'format': 'ndjson'})
+        self.assertTrue(response.streaming)
+        self.assertTrue(
+            response['Content-Type'].startswith('application/x-ndjson')
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [post.pk for post in self.posts[::-1]]
+        )
+        cursor = self.get_json(self.guest_client, url, limit=10)['next']
+        response = self.guest_client.get(cursor + '&format=ndjson')
+        self.assertEqual(
+            len(b''.join(response.streaming_content).splitlines()), 3
+        )
+
+    def test_follow_pages_timeline_entries(self):
+        """Лента подписок листается по записям ленты, курсором и потоком"""
+        url = reverse('api:follow')
+        data = self.get_json(self.authorized_client, url, limit=10)
+        response = self.authorized_client.get(data['next'])
+        self.assertEqual(
+            [post['id'] for post in json.loads(response.content)['results']],
+            [post.pk for post in self.posts[2::-1]]
+        )
+        response = self.authorized_client.get(url, {'format': 'ndjson'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [post.pk for post in self.posts[::-1]]
+        )
+        self.assertEqual(
+            json.loads(lines[0])['author']['username'], 'auth'
+        )
+
+    def test_errors(self):
+        for url, params, status in (
+            (reverse('api:group', args=['missing']), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:profile', args=['missing']), {},
+             HTTPStatus.NOT_FOUND),
+            (reverse('api:follow'), {}, HTTPStatus.UNAUTHORIZED),
+            (reverse('api:posts'), {'cursor': 'broken'},
+             HTTPStatus.BAD_REQUEST),
+            (reverse('api:posts'), {'limit': 'ten'}, HTTPStatus.BAD_REQUEST),
+        ):
+            with self.subTest(url=url, params=params):
+                response = self.guest_client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', json.loads(response.content))
+        response = self.guest_client.post(reverse('api:posts'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.METHOD_NOT_ALLOWED
+        )
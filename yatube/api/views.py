@@ -0,0 +1,139 @@
+import json
+from operator import attrgetter
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+
+from core.paginator import InvalidCursor
+from posts.models import Group, Post, User
+from posts.timeline import (
+    TIMELINE_ORDERING, get_read_authors, get_timeline, get_timeline_entries
+)
+from posts.utils import get_paginator
+
+from .serializers import serialize_post
+
+
+MAX_LIMIT = 100
+# Сколько постов выгрузка NDJSON читает из базы за раз
+STREAM_CHUNK_SIZE = 500
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def json_response(data, status=200):
+    return HttpResponse(
+        dumps(data),
+        status=status,
+        content_type='application/json; charset=utf-8',
+    )
+
+
+def error(detail, status):
+    return json_response({'detail': detail}, status=status)
+
+
+def page_url(request, cursor):
+    """Адрес соседней страницы с теми же параметрами и новым курсором"""
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return request.build_absolute_uri('?' + params.urlencode())
+
+
+def get_self(item):
+    return item
+
+
+def stream(request, paginator, get_post):
+    """Все посты ленты, начиная с курсора, по одному в строке"""
+    cursor = request.GET.get('cursor')
+    items = paginator.after_cursor(cursor) if cursor else paginator.object_list
+    lines = (
+        dumps(serialize_post(get_post(item), request)) + '\n'
+        for item in items.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+    return StreamingHttpResponse(
+        lines, content_type='application/x-ndjson; charset=utf-8'
+    )
+
+
+def feed_response(request, post_list):
+    """Страница ленты постов, см. paginated_response"""
+    return paginated_response(request, get_paginator(post_list.for_feed()))
+
+
+def paginated_response(request, paginator, get_post=get_self):
+    """
+    Страница ленты по курсору:
+    {"results": [...], "next": адрес, "previous": адрес}.
+    ?limit= задаёт размер страницы (не больше MAX_LIMIT),
+    ?format=ndjson отдаёт всю ленту потоком.
+    Число постов не считается, поэтому номеров страниц нет.
+    Пагинатор может листать не посты, а записи со ссылкой на пост:
+    get_post получает пост из записи.
+    """
+    try:
+        limit = int(request.GET.get('limit', paginator.per_page))
+    except ValueError:
+        return error('limit должен быть числом', 400)
+    paginator.per_page = max(1, min(limit, MAX_LIMIT))
+    cursor = request.GET.get('cursor')
+    try:
+        if request.GET.get('format') == 'ndjson':
+            return stream(request, paginator, get_post)
+        page = (
+            paginator.cursor_page(cursor) if cursor
+            else paginator.first_page()
+        )
+    except InvalidCursor:
+        return error('Неверный курсор', 400)
+    return json_response({
+        'results': [serialize_post(get_post(item), request) for item in page],
+        'next': page_url(request, page.next_cursor),
+        'previous': page_url(request, page.previous_cursor),
+    })
+
+
+@require_safe
+def posts(request):
+    """Все посты, как на главной странице"""
+    return feed_response(request, Post.objects.all())
+
+
+@require_safe
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error('Группа не найдена', 404)
+    return feed_response(request, group.posts.all())
+
+
+@require_safe
+def profile(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error('Пользователь не найден', 404)
+    return feed_response(request, author.posts.all())
+
+
+@require_safe
+def follow(request):
+    """Лента подписок пользователя, вошедшего на сайт"""
+    if not request.user.is_authenticated:
+        return error('Нужно войти на сайт', 401)
+    read_authors = get_read_authors(request.user)
+    if read_authors:
+        return feed_response(
+            request, get_timeline(request.user, read_authors)
+        )
+    # Как follow_index: записи ленты листаются по своему индексу
+    paginator = get_paginator(
+        get_timeline_entries(request.user), ordering=TIMELINE_ORDERING
+    )
+    return paginated_response(
+        request, paginator, get_post=attrgetter('post')
+    )
@@ -0,0 +1,25 @@
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .metrics import template_timer
+
+
+class TimedTemplate(Template):
+    """Шаблон, время отрисовки которого попадает в метрики запроса"""
+
+    def render(self, context=None, request=None):
+        with template_timer():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд шаблонов Django с замером времени отрисовки"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,401 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.functional import cached_property
+
+from .metrics import observe_cache
+
+
+# Больше параметров SQLite не принимает в одном запросе
+SQLITE_MAX_PARAMS = 900
+# Раз во столько записей процесс удаляет истёкшие и лишние ключи
+CULL_EVERY = 100
+
+_missing = object()
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кеш в файле SQLite (LOCATION — путь к файлу), общий для всех
+    процессов на машине и не требующий отдельного сервера.
+    Журнал WAL позволяет читать, пока другой процесс пишет;
+    get_many и set_many выполняются одним запросом и одной транзакцией.
+    OPTIONS: MAX_ENTRIES, CULL_FREQUENCY — как у встроенных кешей,
+    TIER — метка уровня в метриках попаданий; без неё попадания
+    не считаются (L2 двухуровневого кеша считает сам TieredCache).
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        self.tier = params.get('OPTIONS', {}).get('TIER')
+        self._local = threading.local()
+        # Кеш общий для потоков процесса: пишут и запросы, и фоновые
+        # потоки очереди комментариев и миниатюр
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    @property
+    def connection(self):
+        """Соединение потока; после fork процесс открывает своё"""
+        pid, connection = getattr(self._local, 'connection', (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=20, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            self._local.connection = (os.getpid(), connection)
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        """
+        Пишущая транзакция: BEGIN IMMEDIATE сразу берёт блокировку
+        записи, и чтение внутри неё видит данные без гонок.
+        """
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self.connection.execute(
+            'SELECT value FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        if self.tier:
+            observe_cache(self.tier, row is not None, row is None)
+        if row is None:
+            return default
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        found = {}
+        now = time.time()
+        for chunk in chunks(list(made), SQLITE_MAX_PARAMS):
+            rows = self.connection.execute(
+                'SELECT key, value FROM cache WHERE key IN ({}) '
+                'AND (expires IS NULL OR expires > ?)'.format(
+                    ', '.join('?' * len(chunk))
+                ), chunk + [now]
+            )
+            for key, value in rows:
+                found[made[key]] = pickle.loads(value)
+        if self.tier:
+            observe_cache(self.tier, len(found), len(made) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append(
+                (key, self.dumps(value), self.get_backend_timeout(timeout))
+            )
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', rows
+            )
+            self.maybe_cull(connection, len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self.transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time())
+            )
+            return connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self.dumps(value), self.get_backend_timeout(timeout))
+            ).rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time())
+        ).rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            # Новый rowid, как у set: часто меняемый счётчик
+            # не вытесняется первым как давно не записывавшийся
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)', (key, self.dumps(value), row[1])
+            )
+        return value
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        made = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            made.append(key)
+        for chunk in chunks(made, SQLITE_MAX_PARAMS):
+            self.connection.execute(
+                'DELETE FROM cache WHERE key IN ({})'.format(
+                    ', '.join('?' * len(chunk))
+                ), chunk
+            )
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        self.connection.execute('DELETE FROM cache')
+
+    def maybe_cull(self, connection, written):
+        """
+        Раз в CULL_EVERY записей удаляет истёкшие ключи, а при
+        превышении MAX_ENTRIES — ещё и 1/CULL_FREQUENCY самых старых
+        записей. INSERT OR REPLACE даёт перезаписанному ключу новый
+        rowid, поэтому «старые» — давно не записывавшиеся.
+        """
+        with self._writes_lock:
+            self._writes += written
+            if self._writes < CULL_EVERY:
+                return
+            self._writes = 0
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE rowid IN ('
+                'SELECT rowid FROM cache ORDER BY rowid LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+
+# Последний прочитанный номер журнала удалений каждого двухуровневого
+# кеша в процессе: {LOCATION: {'sequence': ..., 'checked': ...}}
+_states = {}
+_states_lock = threading.Lock()
+
+SEQUENCE_KEY = 'tiered:sequence'
+LOG_KEY = 'tiered:log:{}'
+# Больше записей журнала за одну проверку не читается: дешевле
+# очистить L1 целиком
+MAX_LOG_READ = 100
+
+
+class TieredCache(BaseCache):
+    """
+    Двухуровневый кеш: L1 в памяти процесса перед общим для процессов
+    кешем L2 (OPTIONS['L2'] — его псевдоним в CACHES).
+
+    Чтение сначала идёт в L1, промахи дочитываются из L2 и кладутся
+    в L1 не дольше чем на L1_TIMEOUT секунд. Запись идёт в оба уровня.
+
+    delete, delete_many, incr и decr добавляют в журнал в L2 запись
+    с изменёнными ключами под следующим номером. Процессы читают
+    журнал не чаще раза в CHECK_INTERVAL секунд и удаляют из своего L1
+    только эти ключи. L1 очищается целиком после clear, а также
+    если процесс отстал от журнала больше чем на MAX_LOG_READ записей
+    или записи уже истекли. set новых ключей журнал не меняет:
+    ключи, значение которых меняется на месте, нужно удалять, а не
+    перезаписывать, иначе другие процессы увидят новое значение только
+    через L1_TIMEOUT.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.l2_alias = options['L2']
+        self.l1_timeout = options.get('L1_TIMEOUT', 10)
+        self.check_interval = options.get('CHECK_INTERVAL', 1)
+        self.l1 = LocMemCache('tiered:' + location, {
+            'TIMEOUT': self.l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+        with _states_lock:
+            self.state = _states.setdefault(
+                location, {'sequence': None, 'checked': 0}
+            )
+
+    @cached_property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def l1_timeout_for(self, timeout):
+        if timeout == DEFAULT_TIMEOUT or timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    @property
+    def log_timeout(self):
+        """
+        Сколько живёт запись журнала: процесс, который не читал его
+        дольше, очищает L1 целиком, а старее L1_TIMEOUT в L1 ничего нет
+        """
+        return self.l1_timeout + self.check_interval + 60
+
+    def check_log(self):
+        """Удаляет из L1 ключи, изменённые другими процессами"""
+        now = time.monotonic()
+        if now - self.state['checked'] < self.check_interval:
+            return
+        self.state['checked'] = now
+        # Пустой журнал — номер 0; None — процесс ещё не читал журнал
+        sequence = self.l2.get(SEQUENCE_KEY, 0)
+        seen = self.state['sequence']
+        if sequence == seen:
+            return
+        self.state['sequence'] = sequence
+        if seen is None or not 0 < sequence - seen <= MAX_LOG_READ:
+            self.l1.clear()
+            return
+        log_keys = [LOG_KEY.format(number)
+                    for number in range(seen + 1, sequence + 1)]
+        entries = self.l2.get_many(log_keys)
+        if len(entries) < len(log_keys) or None in entries.values():
+            # Запись истекла, ещё не записана или это clear
+            self.l1.clear()
+            return
+        for keys in entries.values():
+            for key, version in keys:
+                self.l1.delete(key, version)
+
+    def broadcast(self, keys, version=None):
+        """
+        Ключи устарели в L1 всех процессов; keys=None — весь L1.
+        Свой L1 очищается сразу, остальные — при чтении журнала.
+        """
+        if keys is None:
+            self.l1.clear()
+        else:
+            self.l1.delete_many(keys, version)
+            keys = [(key, version) for key in keys]
+        self.l2.add(SEQUENCE_KEY, 0, None)
+        sequence = self.l2.incr(SEQUENCE_KEY)
+        self.l2.set(LOG_KEY.format(sequence), keys, self.log_timeout)
+
+    def get(self, key, default=None, version=None):
+        self.check_log()
+        value = self.l1.get(key, _missing, version)
+        observe_cache('local', value is not _missing, value is _missing)
+        if value is _missing:
+            value = self.l2.get(key, _missing, version)
+            observe_cache('shared', value is not _missing, value is _missing)
+            if value is _missing:
+                return default
+            self.l1.set(key, value, self.l1_timeout, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        self.check_log()
+        found = self.l1.get_many(keys, version)
+        observe_cache('local', len(found), len(keys) - len(found))
+        missing = [key for key in keys if key not in found]
+        if missing:
+            shared = self.l2.get_many(missing, version)
+            observe_cache('shared', len(shared), len(missing) - len(shared))
+            if shared:
+                self.l1.set_many(shared, self.l1_timeout, version)
+                found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version)
+        self.l1.set(key, value, self.l1_timeout_for(timeout), version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version)
+        self.l1.set_many(data, self.l1_timeout_for(timeout), version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version)
+        if added:
+            self.l1.set(key, value, self.l1_timeout_for(timeout), version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version)
+        self.broadcast([key], version)
+        return value
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version)
+        self.broadcast([key], version)
+
+    def delete_many(self, keys, version=None):
+        self.l2.delete_many(keys, version)
+        self.broadcast(list(keys), version)
+
+    def has_key(self, key, version=None):
+        self.check_log()
+        return (
+            self.l1.has_key(key, version) or self.l2.has_key(key, version)
+        )
+
+    def clear(self):
+        self.l2.clear()
+        self.broadcast(None)
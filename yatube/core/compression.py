@@ -0,0 +1,107 @@
+import gzip
+import re
+import zlib
+from functools import wraps
+
+from django.conf import settings
+
+from .static import accepted_encodings, brotli
+
+# Содержимое этих тегов выводится с пробелами как есть
+PRESERVED_RE = re.compile(
+    r'<(pre|textarea|script|style)\b[^>]*>.*?(?:</\1\s*>|$)',
+    re.DOTALL | re.IGNORECASE
+)
+# Пробелы вокруг перевода строки: отступы и пустые строки шаблонов
+NEWLINE_RE = re.compile(r'[ \t\r\f\v]*\n\s*')
+
+# gzip-заголовок вместо zlib для zlib.compressobj
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def minify_html(html):
+    """
+    Заменяет пробелы вокруг переводов строк одним переводом строки.
+    Браузер выводит любую последовательность пробелов как один пробел,
+    поэтому страница выглядит так же. pre, textarea, script и style
+    не меняются; пробелы внутри строки не трогаются, чтобы не менять
+    значения атрибутов.
+    """
+    parts = []
+    position = 0
+    for match in PRESERVED_RE.finditer(html):
+        parts.append(NEWLINE_RE.sub('\n', html[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(NEWLINE_RE.sub('\n', html[position:]))
+    return ''.join(parts)
+
+
+def compress_exempt(view_func):
+    """Ответ представления не сжимается и не минифицируется"""
+    @wraps(view_func)
+    def wrapped_view(*args, **kwargs):
+        response = view_func(*args, **kwargs)
+        response.compress_exempt = True
+        return response
+    return wrapped_view
+
+
+def choose_encoding(request):
+    """br (при установленном brotli) или gzip, если их принимает клиент"""
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=settings.COMPRESS_BROTLI_QUALITY)
+    return gzip.compress(data, settings.COMPRESS_LEVEL, mtime=0)
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(
+        settings.COMPRESS_LEVEL, zlib.DEFLATED, GZIP_WBITS
+    )
+    return compress_chunks(
+        chunks, compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    )
+
+
+def brotli_stream(chunks):
+    compressor = brotli.Compressor(quality=settings.COMPRESS_BROTLI_QUALITY)
+    return compress_chunks(
+        chunks, compressor.process, compressor.flush, compressor.finish
+    )
+
+
+def compress_chunks(chunks, compress, flush, finish):
+    """
+    Сжимает поток частей. Сжатые данные отправляются клиенту, когда
+    с прошлой отправки набралось COMPRESS_STREAM_FLUSH_SIZE байт
+    исходных данных: частый flush на мелких частях (строках ndjson)
+    портит сжатие, редкий — задерживает начало ответа.
+    """
+    pending = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        data = compress(chunk)
+        pending += len(chunk)
+        if pending >= settings.COMPRESS_STREAM_FLUSH_SIZE:
+            data += flush()
+            pending = 0
+        if data:
+            yield data
+    yield finish()
+
+
+def compress_stream(chunks, encoding):
+    if encoding == 'br':
+        return brotli_stream(chunks)
+    return gzip_stream(chunks)
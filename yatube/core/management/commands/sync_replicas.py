@@ -0,0 +1,45 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.routers import get_replicas
+
+
+def copy_sqlite(source, path):
+    """Копирует открытую базу SQLite в файл через backup API"""
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик из DB_REPLICAS. '
+        'Так маршрутизацию чтения можно проверить на одной машине: '
+        'реплика отстаёт от основной базы до следующего запуска'
+    )
+
+    def handle(self, *args, **options):
+        source = connections['default']
+        if source.vendor != 'sqlite':
+            raise CommandError('Основная база не SQLite')
+        replicas = [
+            alias for alias in get_replicas()
+            if connections[alias].vendor == 'sqlite'
+        ]
+        if not replicas:
+            raise CommandError('Реплик SQLite нет, задайте DB_REPLICAS')
+        source.ensure_connection()
+        for alias in replicas:
+            started = time.perf_counter()
+            path = settings.DATABASES[alias]['NAME']
+            connections[alias].close()
+            copy_sqlite(source.connection, path)
+            self.stdout.write('{}: {}, за {:.1f} с'.format(
+                alias, path, time.perf_counter() - started
+            ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.warmup import format_report, get_unknown_steps, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет прогрев процесса, как wsgi.py при запуске, и печатает '
+        'время каждого шага. Без аргументов — все шаги WARMUP_STEPS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('steps', nargs='*')
+
+    def handle(self, *args, **options):
+        unknown = get_unknown_steps(options['steps'])
+        if unknown:
+            raise CommandError(
+                'Нет шагов прогрева: {}'.format(', '.join(unknown))
+            )
+        for line in format_report(warm_up(options['steps'])):
+            self.stdout.write(line)
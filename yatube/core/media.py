@@ -0,0 +1,152 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.http import parse_http_date_safe
+
+
+SERVE_DJANGO = 'django'
+SERVE_X_ACCEL_REDIRECT = 'x-accel-redirect'
+SERVE_X_SENDFILE = 'x-sendfile'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    """Запрошенный диапазон лежит за концом файла"""
+    pass
+
+
+class FileRange:
+    """
+    Файл, из которого читается только диапазон байт.
+    У него нет name и fileno, поэтому FileResponse не выставит длину
+    всего файла, а сервер не отправит файл целиком через sendfile.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def get_media_path(path):
+    """Путь к файлу внутри MEDIA_ROOT или 404"""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+    return full_path
+
+
+def get_content_type(path):
+    content_type, encoding = mimetypes.guess_type(path)
+    if encoding:
+        return 'application/octet-stream'
+    return content_type or 'application/octet-stream'
+
+
+def file_etag(stat):
+    """ETag по времени изменения и размеру, без чтения файла"""
+    return '"{:x}-{:x}"'.format(stat.st_mtime_ns, stat.st_size)
+
+
+def if_range_matches(request, etag, last_modified):
+    """
+    Диапазон отдаётся, только если If-Range совпадает с текущей версией
+    файла, иначе клиент получает файл целиком.
+    """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def parse_range(header, size):
+    """
+    Разбирает Range: bytes=... в пару (начало, длина).
+    Поддерживается один диапазон; несколько диапазонов и нераспознанный
+    заголовок дают None, и файл отдаётся целиком, как разрешает RFC 7233.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        # bytes=-N — последние N байт
+        length = min(int(last), size)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return size - length, length
+    start = int(first)
+    if last != '' and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    end = size - 1 if last == '' else min(int(last), size - 1)
+    return start, end - start + 1
+
+
+def redirect_header(path, full_path):
+    """
+    Заголовок, по которому файл отдаёт прокси перед приложением,
+    или None, если файл отдаёт само приложение.
+    """
+    mode = settings.MEDIA_SERVE_MODE
+    if mode == SERVE_X_ACCEL_REDIRECT:
+        return 'X-Accel-Redirect', settings.MEDIA_ACCEL_REDIRECT_PREFIX + path
+    if mode == SERVE_X_SENDFILE:
+        return 'X-Sendfile', full_path
+    return None
+
+
+def file_response(request, full_path, stat, etag):
+    """
+    Ответ с файлом целиком или с диапазоном из заголовка Range.
+    Файл целиком сервер WSGI может отдать через sendfile.
+    """
+    content_type = get_content_type(full_path)
+    size = stat.st_size
+    byte_range = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */{}'.format(size)
+            return response
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, length = byte_range
+        response = FileResponse(
+            FileRange(file, start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = 'bytes {}-{}/{}'.format(
+            start, start + length - 1, size
+        )
+    response['Accept-Ranges'] = 'bytes'
+    return response
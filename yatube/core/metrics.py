@@ -0,0 +1,237 @@
+import threading
+import time
+from bisect import bisect_left
+
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_local = threading.local()
+
+
+class RequestStats:
+    """
+    Счётчики одного запроса: число и время SQL-запросов и время шаблонов.
+    Экземпляр подключается к соединениям как execute_wrapper.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def server_timing(self, total):
+        """Значение заголовка Server-Timing, время в миллисекундах"""
+        return (
+            'db;dur={:.1f};desc="{} queries", '
+            'tpl;dur={:.1f}, total;dur={:.1f}'.format(
+                self.db_time * 1000, self.queries,
+                self.template_time * 1000, total * 1000
+            )
+        )
+
+
+def get_current_stats():
+    """Счётчики запроса, который обрабатывается в этом потоке"""
+    return getattr(_local, 'stats', None)
+
+
+def set_current_stats(stats):
+    _local.stats = stats
+
+
+class template_timer:
+    """
+    Засекает время отрисовки шаблона для текущего запроса.
+    Вложенные отрисовки не учитываются повторно.
+    """
+
+    def __enter__(self):
+        self.stats = get_current_stats()
+        if self.stats is not None:
+            self.stats.template_depth += 1
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.stats is None:
+            return
+        self.stats.template_depth -= 1
+        if self.stats.template_depth == 0:
+            self.stats.template_time += time.perf_counter() - self.started
+
+
+def escape_label(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, escape_label(value)) for name, value in pairs
+    ) + '}'
+
+
+class Counter:
+    """Счётчик Prometheus с метками"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            yield '{}{} {}'.format(
+                self.name, format_labels(self.labels, labels), value
+            )
+
+
+class Histogram(Counter):
+    """Гистограмма Prometheus с метками и накопительными корзинами"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0
+                }
+            index = bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        with self.lock:
+            values = {
+                labels: dict(series, buckets=list(series['buckets']))
+                for labels, series in self.values.items()
+            }
+        for labels, series in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['buckets']):
+                cumulative += count
+                yield '{}_bucket{} {}'.format(self.name, format_labels(
+                    self.labels, labels, [('le', bound)]
+                ), cumulative)
+            yield '{}_bucket{} {}'.format(self.name, format_labels(
+                self.labels, labels, [('le', '+Inf')]
+            ), series['count'])
+            yield '{}_sum{} {}'.format(
+                self.name, format_labels(self.labels, labels), series['sum']
+            )
+            yield '{}_count{} {}'.format(
+                self.name, format_labels(self.labels, labels), series['count']
+            )
+
+
+class Registry:
+    """Метрики процесса"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self):
+        """Все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(
+                metric.name, metric.documentation
+            ))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.register(Counter(
+    'yatube_requests_total',
+    'Число обработанных запросов',
+    labels=('view', 'status'),
+))
+REQUEST_DURATION = REGISTRY.register(Histogram(
+    'yatube_request_duration_seconds',
+    'Полное время обработки запроса',
+    labels=('view',),
+    buckets=DURATION_BUCKETS,
+))
+DB_QUERIES = REGISTRY.register(Histogram(
+    'yatube_db_queries',
+    'Число SQL-запросов за один запрос',
+    labels=('view',),
+    buckets=QUERY_BUCKETS,
+))
+DB_DURATION = REGISTRY.register(Histogram(
+    'yatube_db_duration_seconds',
+    'Время SQL-запросов за один запрос',
+    labels=('view',),
+    buckets=DURATION_BUCKETS,
+))
+TEMPLATE_DURATION = REGISTRY.register(Histogram(
+    'yatube_template_duration_seconds',
+    'Время отрисовки шаблонов за один запрос',
+    labels=('view',),
+    buckets=DURATION_BUCKETS,
+))
+
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'yatube_cache_requests_total',
+    'Чтения ключей из кеша по уровням: попадания и промахи',
+    labels=('tier', 'result'),
+))
+
+
+def observe_request(view, status, stats, total):
+    """Добавляет запрос в метрики процесса"""
+    labels = (view,)
+    REQUESTS.inc((view, status))
+    REQUEST_DURATION.observe(labels, total)
+    DB_QUERIES.observe(labels, stats.queries)
+    DB_DURATION.observe(labels, stats.db_time)
+    TEMPLATE_DURATION.observe(labels, stats.template_time)
+
+
+def observe_cache(tier, hits, misses):
+    """Добавляет в метрики результат чтения ключей из уровня кеша"""
+    if hits:
+        CACHE_REQUESTS.inc((tier, 'hit'), hits)
+    if misses:
+        CACHE_REQUESTS.inc((tier, 'miss'), misses)
@@ -0,0 +1,163 @@
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import compression, metrics, routers
+
+
+# Методы, которые не должны ничего менять (RFC 7231)
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет каждый запрос: число и время SQL-запросов, время шаблонов
+    и полное время. Отдаёт их в заголовке Server-Timing и копит
+    в гистограммах процесса, которые показывает /core/metrics.
+    Должен стоять первым в MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = metrics.RequestStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            metrics.set_current_stats(stats)
+            try:
+                response = self.get_response(request)
+            finally:
+                metrics.set_current_stats(None)
+        total = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        metrics.observe_request(view, response.status_code, stats, total)
+        response['Server-Timing'] = stats.server_timing(total)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Выбирает базу для чтения на время запроса.
+    GET и HEAD к представлениям из REPLICA_VIEWS читают посты со
+    случайной реплики. Запрос POST (и другие небезопасные методы),
+    который что-то записал, ставит cookie
+    REPLICA_STICKY_COOKIE, и следующие REPLICA_STICKY_SECONDS секунд
+    пользователь читает из основной базы, видя свои изменения
+    до того, как они дойдут до реплик.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.use_replica(None)
+        try:
+            response = self.get_response(request)
+            # Попутные записи при чтении (пересчёт счётчиков и т. п.)
+            # не повод читать из основной базы
+            if (routers.has_written()
+                    and request.method not in SAFE_METHODS):
+                self.stick_to_primary(response)
+        finally:
+            routers.use_replica(None)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        replicas = routers.get_replicas()
+        if (replicas
+                and request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name in settings.REPLICA_VIEWS
+                and not self.is_sticky(request)):
+            routers.use_replica(random.choice(replicas))
+
+    def is_sticky(self, request):
+        try:
+            until = float(request.COOKIES[settings.REPLICA_STICKY_COOKIE])
+        except (KeyError, ValueError):
+            return False
+        return until > time.time()
+
+    def stick_to_primary(self, response):
+        seconds = settings.REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            settings.REPLICA_STICKY_COOKIE,
+            str(time.time() + seconds),
+            max_age=seconds,
+            httponly=True,
+            samesite='Lax',
+        )
+
+
+class CompressionMiddleware:
+    """
+    Минифицирует HTML (настройка HTML_MINIFY) и сжимает ответы
+    с типом из COMPRESS_CONTENT_TYPES в br или gzip по Accept-Encoding.
+    Обычные ответы короче COMPRESS_MIN_SIZE байт не сжимаются,
+    потоковые сжимаются по мере отдачи. Ответы представлений
+    с декоратором compress_exempt, диапазоны и уже сжатые ответы
+    отдаются как есть. Должен стоять в MIDDLEWARE выше всех, кто
+    меняет тело ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';')[0].lower()
+        if (getattr(response, 'compress_exempt', False)
+                or response.has_header('Content-Encoding')
+                or response.status_code == 206
+                or content_type not in settings.COMPRESS_CONTENT_TYPES):
+            return response
+        if content_type == 'text/html' and not response.streaming:
+            self.minify(response)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = compression.choose_encoding(request)
+        if encoding is None:
+            return response
+        if response.streaming:
+            response.streaming_content = compression.compress_stream(
+                response.streaming_content, encoding
+            )
+            del response['Content-Length']
+        elif not self.compress(response, encoding):
+            return response
+        if response.has_header('ETag'):
+            # Сжатое тело отличается побайтно, но не по смыслу
+            response['ETag'] = 'W/' + response['ETag'].replace('W/', '', 1)
+        response['Content-Encoding'] = encoding
+        return response
+
+    def minify(self, response):
+        if not settings.HTML_MINIFY:
+            return
+        try:
+            html = response.content.decode(response.charset)
+        except UnicodeDecodeError:
+            return
+        response.content = compression.minify_html(html)
+        self.set_length(response)
+
+    def compress(self, response, encoding):
+        """Сжимает тело, если оно достаточно длинное и стало короче"""
+        if len(response.content) < settings.COMPRESS_MIN_SIZE:
+            return False
+        compressed = compression.compress_bytes(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return False
+        response.content = compressed
+        self.set_length(response)
+        return True
+
+    def set_length(self, response):
+        if response.has_header('Content-Length'):
+            response['Content-Length'] = str(len(response.content))
@@ -0,0 +1,226 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    """Курсор не удалось разобрать"""
+    pass
+
+
+class ElidedPaginator(Paginator):
+    """
+    Пагинатор с сокращённым списком страниц: первые и последние
+    on_ends страниц и on_each_side страниц вокруг текущей, пропуски
+    заменены на ELLIPSIS. Ссылок на странице не больше
+    2 * (on_each_side + on_ends) + 3, сколько бы страниц ни было.
+    """
+
+    ELLIPSIS = '…'
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        number = self.validate_number(number)
+        last = self.num_pages
+        if last <= (on_each_side + on_ends) * 2 + 1:
+            return list(self.page_range)
+        pages = []
+        if number - on_each_side > on_ends + 2:
+            pages.extend(range(1, on_ends + 1))
+            pages.append(self.ELLIPSIS)
+            pages.extend(range(number - on_each_side, number))
+        else:
+            pages.extend(range(1, number))
+        if number + on_each_side < last - on_ends - 1:
+            pages.extend(range(number, number + on_each_side + 1))
+            pages.append(self.ELLIPSIS)
+            pages.extend(range(last - on_ends + 1, last + 1))
+        else:
+            pages.extend(range(number, last + 1))
+        return pages
+
+
+class CursorPaginator(ElidedPaginator):
+    """
+    Пагинатор по ключу сортировки (keyset pagination).
+    Страница по ?cursor= выбирается условием WHERE по последнему
+    показанному ключу вместо OFFSET и не требует COUNT(*), поэтому
+    N-я страница стоит столько же, сколько первая.
+    Номерные страницы (?page=) по-прежнему доступны, у каждой
+    страницы есть курсоры соседних страниц: next_cursor и previous_cursor.
+    При заданном count_limit число объектов считается приблизительно:
+    не больше count_limit строк. Известное заранее число объектов
+    (например, из счётчика) передаётся в count и не запрашивается.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 count_limit=None, count=None, **kwargs):
+        self.ordering = tuple(ordering)
+        self.count_limit = count_limit
+        if count is not None:
+            self.count = count
+        super().__init__(
+            object_list.order_by(*self.ordering), per_page, **kwargs
+        )
+
+    @cached_property
+    def count(self):
+        """Общее число объектов, при count_limit — не больше лимита"""
+        # values('pk') убирает из подсчёта аннотации и select_related
+        object_list = self.object_list.values('pk')
+        if self.count_limit is not None:
+            object_list = object_list[:self.count_limit]
+        return object_list.count()
+
+    @property
+    def count_is_approximate(self):
+        """Число объектов упёрлось в count_limit"""
+        return (
+            self.count_limit is not None and self.count >= self.count_limit
+        )
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """
+        При приблизительном числе объектов последняя страница неизвестна:
+        после соседних с текущей страниц выводится только пропуск.
+        """
+        pages = super().get_elided_page_range(number, on_each_side, on_ends)
+        if not self.count_is_approximate:
+            return pages
+        number = self.validate_number(number)
+        pages = [
+            page for page in pages
+            if page == self.ELLIPSIS or page <= number + on_each_side
+        ]
+        if pages[-1] != self.ELLIPSIS:
+            pages.append(self.ELLIPSIS)
+        return pages
+
+    def page(self, number):
+        """Номерная страница с курсорами соседних страниц"""
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return self._build_page(
+            rows[:self.per_page],
+            number,
+            has_next=len(rows) > self.per_page,
+            has_previous=number > 1,
+        )
+
+    def first_page(self):
+        """Первая страница без подсчёта числа объектов"""
+        rows = list(self.object_list[:self.per_page + 1])
+        return self._build_page(
+            rows[:self.per_page],
+            1,
+            has_next=len(rows) > self.per_page,
+            has_previous=False,
+        )
+
+    def cursor_page(self, cursor):
+        """
+        Страница, следующая за курсором (или предшествующая ему).
+        Номер такой страницы неизвестен, поэтому number равен None.
+        """
+        direction, values = self.decode_cursor(cursor)
+        keyset = self._keyset_filter(values, reverse=direction == PREVIOUS)
+        object_list = self.object_list.filter(keyset)
+        if direction == PREVIOUS:
+            object_list = object_list.reverse()
+        rows = list(object_list[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == PREVIOUS:
+            rows.reverse()
+            return self._build_page(
+                rows, None, has_next=True, has_previous=has_more
+            )
+        return self._build_page(
+            rows, None, has_next=has_more, has_previous=True
+        )
+
+    def after_cursor(self, cursor):
+        """Все объекты после курсора следующей страницы, для выгрузки"""
+        direction, values = self.decode_cursor(cursor)
+        if direction != NEXT:
+            raise InvalidCursor(cursor)
+        return self.object_list.filter(self._keyset_filter(values))
+
+    def get_cursor_page(self, cursor):
+        """
+        Как get_page, но по курсору: при ошибке отдаёт первую страницу,
+        не считая объекты.
+        """
+        try:
+            return self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.first_page()
+
+    def encode_cursor(self, obj, direction=NEXT):
+        """Непрозрачный токен с ключом сортировки объекта"""
+        values = [self._field(name).value_to_string(obj)
+                  for name in self._key_names]
+        payload = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Разбирает токен в направление и значения ключа сортировки"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, *raw_values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode()
+            )
+            if (direction not in (NEXT, PREVIOUS)
+                    or len(raw_values) != len(self._key_names)):
+                raise InvalidCursor(cursor)
+            values = [self._field(name).to_python(value)
+                      for name, value in zip(self._key_names, raw_values)]
+        except (ValueError, TypeError, ValidationError, binascii.Error):
+            raise InvalidCursor(cursor)
+        if any(value is None for value in values):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    @cached_property
+    def _key_names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _field(self, name):
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _keyset_filter(self, values, reverse=False):
+        """
+        Условие «строго после ключа» в порядке сортировки:
+        (a < x) OR (a = x AND b < y) OR ... для убывающих полей.
+        """
+        condition = Q()
+        equal = {}
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip('-')
+            descending = order.startswith('-') != reverse
+            lookup = '{}__{}'.format(name, 'lt' if descending else 'gt')
+            condition |= Q(**equal, **{lookup: value})
+            equal[name] = value
+        return condition
+
+    def _build_page(self, rows, number, has_next, has_previous):
+        page = Page(rows, number, self)
+        page.next_cursor = (
+            self.encode_cursor(rows[-1], NEXT)
+            if rows and has_next else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0], PREVIOUS)
+            if rows and has_previous else None
+        )
+        return page
@@ -0,0 +1,55 @@
+import threading
+
+from django.conf import settings
+
+
+_local = threading.local()
+
+
+def get_replicas():
+    """Псевдонимы баз-реплик из DATABASES"""
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+def use_replica(alias):
+    """
+    Запросы этого потока читают модели REPLICA_READ_APPS с реплики
+    alias, None — из основной базы.
+    """
+    _local.replica = alias
+    _local.wrote = False
+
+
+def get_current_replica():
+    return getattr(_local, 'replica', None)
+
+
+def has_written():
+    """Поток записывал модели REPLICA_READ_APPS с последнего use_replica"""
+    return getattr(_local, 'wrote', False)
+
+
+class ReplicaRouter:
+    """
+    Чтение моделей приложений из REPLICA_READ_APPS идёт на реплику,
+    выбранную для запроса ReplicaMiddleware; запись и всё остальное —
+    в основную базу. Вне запросов, в представлениях не из REPLICA_VIEWS
+    и без реплик все запросы идут в default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_READ_APPS:
+            return get_current_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_READ_APPS:
+            _local.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Настройки SQLite из SQLITE_PRAGMAS для каждого нового соединения"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA {} = {}'.format(name, value))
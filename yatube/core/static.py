@@ -0,0 +1,156 @@
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.utils._os import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Файлы, которые уже сжаты: повторное сжатие ничего не даёт
+COMPRESSED_EXTENSIONS = {
+    '.br', '.gz', '.zip', '.png', '.jpg', '.jpeg', '.gif', '.webp',
+    '.woff', '.woff2', '.mp4', '.webm',
+}
+# Сжатый вариант сохраняется, только если он меньше этой доли исходного
+MIN_RATIO = 0.95
+# Файлы меньше этого размера не сжимаются
+MIN_SIZE = 256
+
+# Имя с хешем содержимого: logo.1a2b3c4d5e6f.png
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+# Варианты файла в порядке предпочтения: (кодировка, суффикс)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def compress_gzip(data):
+    # mtime=0: одинаковое содержимое даёт одинаковый .gz
+    return gzip.compress(data, 9, mtime=0)
+
+
+def compress_brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def get_compressors():
+    """Суффикс и функция сжатия; .br — только с установленным brotli"""
+    compressors = [('.gz', compress_gzip)]
+    if brotli is not None:
+        compressors.insert(0, ('.br', compress_brotli))
+    return compressors
+
+
+def should_compress(name, size):
+    extension = os.path.splitext(name)[1].lower()
+    return size >= MIN_SIZE and extension not in COMPRESSED_EXTENSIONS
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic пишет файлы с хешем содержимого в имени
+    (их можно кешировать навсегда) и рядом с каждым сжимаемым
+    файлом — варианты .gz и .br, чтобы не сжимать их на каждый запрос.
+    До первого collectstatic {% static %} отдаёт адреса без хеша.
+    """
+
+    @property
+    def manifest_strict(self):
+        # Без DEBUG файл не из манифеста — ошибка сборки статики,
+        # а не повод хешировать его с диска на каждый {% static %}
+        return not settings.DEBUG
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            # Манифеста нет: collectstatic ещё не запускался
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if not dry_run:
+            for name in sorted(set(self.hashed_files.values())):
+                self.compress(name)
+
+    def compress(self, name):
+        """Записывает сжатые варианты файла, которые заметно меньше него"""
+        with self.open(name) as file:
+            data = file.read()
+        if not should_compress(name, len(data)):
+            return
+        for suffix, compressor in get_compressors():
+            compressed = compressor(data)
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            if len(compressed) < len(data) * MIN_RATIO:
+                self._save(name + suffix, ContentFile(compressed))
+
+
+def get_static_path(path):
+    """Путь к файлу внутри STATIC_ROOT или 404"""
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('Файл не найден')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден')
+    return full_path
+
+
+def accepted_encodings(header):
+    """
+    Кодировки из Accept-Encoding с ненулевым q.
+    '*' разрешает все кодировки, не отвергнутые явно.
+    """
+    accepted = set()
+    rejected = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        (accepted if quality > 0 else rejected).add(coding)
+    if '*' in accepted:
+        accepted.update(
+            coding for coding, suffix in ENCODINGS if coding not in rejected
+        )
+    return accepted - rejected
+
+
+def choose_variant(request, full_path):
+    """
+    Сжатый вариант файла, который принимает клиент, или сам файл.
+    Возвращает (путь, кодировка или None).
+    """
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for coding, suffix in ENCODINGS:
+        if coding in accepted and os.path.isfile(full_path + suffix):
+            return full_path + suffix, coding
+    return full_path, None
+
+
+def has_variants(full_path):
+    return any(
+        os.path.isfile(full_path + suffix) for coding, suffix in ENCODINGS
+    )
+
+
+def is_immutable(path):
+    """Имя с хешем содержимого никогда не указывает на другой файл"""
+    return HASHED_NAME_RE.search(path) is not None
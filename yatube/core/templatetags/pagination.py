@@ -0,0 +1,19 @@
+from django import template
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def elided_page_range(page_obj, on_each_side=2, on_ends=1):
+    """
+    Номера страниц для навигации: сокращённый список у ElidedPaginator,
+    все страницы у остальных пагинаторов.
+    Использование: {% elided_page_range page_obj as pages %}
+    """
+    paginator = page_obj.paginator
+    if hasattr(paginator, 'get_elided_page_range'):
+        return paginator.get_elided_page_range(
+            page_obj.number, on_each_side=on_each_side, on_ends=on_ends
+        )
+    return paginator.page_range
@@ -0,0 +1,174 @@
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from yatube.caches import get_caches
+
+from .. import cache as cache_backends
+from ..metrics import CACHE_REQUESTS
+
+
+TEMP_DIR = tempfile.mkdtemp()
+SHARED = {
+    'BACKEND': 'core.cache.SQLiteCache',
+    'LOCATION': os.path.join(TEMP_DIR, 'cache.sqlite3'),
+    'OPTIONS': {'MAX_ENTRIES': 30, 'CULL_FREQUENCY': 2},
+}
+
+
+def tiered(location):
+    return {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': location,
+        'OPTIONS': {'L2': 'shared', 'L1_TIMEOUT': 60, 'CHECK_INTERVAL': 0},
+    }
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': SHARED,
+    # Два двухуровневых кеша с разными L1 — как два процесса
+    'process_a': tiered('process_a'),
+    'process_b': tiered('process_b'),
+})
+class SharedCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.shared = caches['shared']
+        self.process_a = caches['process_a']
+        self.process_b = caches['process_b']
+        self.process_a.clear()
+        self.shared.clear()
+
+    def test_sqlite_cache_operations(self):
+        shared = self.shared
+        shared.set('key', {'value': 1})
+        self.assertEqual(shared.get('key'), {'value': 1})
+        self.assertFalse(shared.add('key', 2))
+        self.assertTrue(shared.add('new', 2))
+        self.assertEqual(shared.get_many(['key', 'new', 'missing']), {
+            'key': {'value': 1}, 'new': 2
+        })
+        self.assertEqual(shared.incr('new', 3), 5)
+        with self.assertRaises(ValueError):
+            shared.incr('missing')
+        shared.delete_many(['key', 'new'])
+        self.assertIsNone(shared.get('key'))
+        self.assertFalse(shared.has_key('new'))
+
+    def test_sqlite_cache_expiry(self):
+        self.shared.set('short', 1, 0.05)
+        self.shared.set('forever', 1, None)
+        time.sleep(0.1)
+        self.assertIsNone(self.shared.get('short'))
+        self.assertTrue(self.shared.add('short', 2))
+        self.assertEqual(self.shared.get('forever'), 1)
+
+    def test_sqlite_cache_cull(self):
+        """Лишние записи удаляются, начиная с самых старых"""
+        self.shared.set_many({
+            'key_{}'.format(i): i for i in range(cache_backends.CULL_EVERY)
+        })
+        count = self.shared.connection.execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()[0]
+        self.assertEqual(count, cache_backends.CULL_EVERY // 2)
+        self.assertIsNone(self.shared.get('key_0'))
+        self.assertEqual(self.shared.get('key_99'), 99)
+
+    def test_sqlite_cache_incr_not_culled_first(self):
+        """Счётчик, изменённый последним, не считается старой записью"""
+        self.shared.set('counter', 0)
+        self.shared.set_many({'key_{}'.format(i): i for i in range(40)})
+        self.shared.incr('counter')
+        # Следующая запись запускает вытеснение половины записей
+        self.shared._writes = cache_backends.CULL_EVERY - 1
+        self.shared.set('last', 1)
+        self.assertIsNone(self.shared.get('key_0'))
+        self.assertEqual(self.shared.get('counter'), 1)
+
+    def test_shared_between_processes(self):
+        """Значение, записанное одним процессом, читает другой"""
+        self.process_a.set_many({'card_1': 'A', 'card_2': 'B'})
+        self.assertEqual(self.process_b.get_many(['card_1', 'card_2']), {
+            'card_1': 'A', 'card_2': 'B'
+        })
+        # Теперь значение есть в L1 процесса b
+        self.shared.delete_many(['card_1', 'card_2'])
+        self.assertEqual(self.process_b.get('card_1'), 'A')
+
+    def test_delete_broadcast(self):
+        """Удалённый в одном процессе ключ пропадает из L1 остальных"""
+        self.process_a.set('feed_version', 'old')
+        self.assertEqual(self.process_b.get('feed_version'), 'old')
+        self.process_a.delete('feed_version')
+        self.assertIsNone(self.process_b.get('feed_version'))
+        self.assertTrue(self.process_b.add('feed_version', 'new'))
+        self.assertEqual(self.process_a.get('feed_version'), 'new')
+
+    def test_delete_keeps_other_keys(self):
+        """Удаление ключа не очищает остальной L1 других процессов"""
+        self.process_a.set_many({'card_1': 'A', 'card_2': 'B'})
+        self.process_b.get_many(['card_1', 'card_2'])
+        # Без журнала: если L1 процесса b очистится, card_2 пропадёт
+        self.shared.delete('card_2')
+        self.process_a.delete('card_1')
+        self.assertIsNone(self.process_b.get('card_1'))
+        self.assertEqual(self.process_b.get('card_2'), 'B')
+
+    def test_clear_broadcast(self):
+        self.process_a.set('card_1', 'A')
+        self.process_b.get('card_1')
+        self.process_a.clear()
+        self.assertIsNone(self.process_b.get('card_1'))
+
+    def test_lagging_process_clears_l1(self):
+        """Процесс, отставший от журнала, очищает L1 целиком"""
+        self.process_a.set_many({'card_1': 'A', 'card_2': 'B'})
+        self.process_b.get_many(['card_1', 'card_2'])
+        self.shared.delete('card_2')
+        with mock.patch.object(cache_backends, 'MAX_LOG_READ', 2):
+            for number in range(3):
+                self.process_a.delete('other_{}'.format(number))
+            self.assertIsNone(self.process_b.get('card_2'))
+
+    def test_hit_miss_stats(self):
+        before = dict(CACHE_REQUESTS.values)
+        self.process_a.set('key', 1)
+        self.process_b.get('key')
+        self.process_b.get('key')
+        self.process_b.get('missing')
+        changes = {
+            labels: value - before.get(labels, 0)
+            for labels, value in CACHE_REQUESTS.values.items()
+        }
+        self.assertEqual(changes[('local', 'hit')], 1)
+        self.assertEqual(changes[('local', 'miss')], 2)
+        self.assertEqual(changes[('shared', 'hit')], 1)
+        self.assertEqual(changes[('shared', 'miss')], 1)
+
+
+class CacheSettingsTests(SimpleTestCase):
+    def test_cache_tiers(self):
+        self.assertEqual(list(get_caches('/srv', env={})), ['default'])
+        self.assertEqual(
+            get_caches('/srv', env={'CACHE_TIER': 'sqlite'})['default'][
+                'LOCATION'
+            ],
+            '/srv/cache.sqlite3'
+        )
+        tiered_caches = get_caches('/srv', env={'CACHE_TIER': 'tiered'})
+        self.assertEqual(
+            tiered_caches['default']['OPTIONS']['L2'], 'shared'
+        )
+        with self.assertRaises(ValueError):
+            get_caches('/srv', env={'CACHE_TIER': 'redis'})
@@ -0,0 +1,183 @@
+import gzip
+import json
+import zlib
+
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+
+from posts.models import Post, User
+
+from ..compression import compress_exempt, minify_html
+from ..middleware import CompressionMiddleware
+
+HTML = '<p>' + 'Текст поста. ' * 50 + '</p>'
+
+
+class MinifyHtmlTests(SimpleTestCase):
+    def test_collapses_indentation(self):
+        self.assertEqual(
+            minify_html('<ul>\n    <li>1</li>\n\n    <li>2</li>  \n</ul>\n'),
+            '<ul>\n<li>1</li>\n<li>2</li>\n</ul>\n'
+        )
+
+    def test_preserved(self):
+        """pre, textarea, script, style и пробелы в строке не меняются"""
+        for html in (
+            '<pre>\n    код\n</pre>',
+            '<textarea name="text">\n  абзац\n\n  ещё</textarea>',
+            '<script>\n  var a = "  \\n  ";\n</script>',
+            '<STYLE>\n  p { margin: 0 }\n</STYLE>',
+            '<a title="два  пробела">ссылка  с пробелами</a>',
+            '<pre>\n    без закрывающего тега',
+        ):
+            with self.subTest(html=html):
+                self.assertEqual(minify_html(html), html)
+
+    def test_text_around_preserved(self):
+        self.assertEqual(
+            minify_html('<div>\n  <pre>\n  x\n  </pre>\n  </div>'),
+            '<div>\n<pre>\n  x\n  </pre>\n</div>'
+        )
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def process(self, response, **headers):
+        middleware = CompressionMiddleware(lambda request: response)
+        return middleware(self.factory.get('/', **headers))
+
+    def test_gzip(self):
+        response = self.process(
+            HttpResponse(HTML), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(response.content).decode(), HTML)
+
+    def test_not_compressed(self):
+        cases = {
+            'без Accept-Encoding': (HttpResponse(HTML), ''),
+            'gzip;q=0': (HttpResponse(HTML), 'gzip;q=0, deflate'),
+            'короткий ответ': (HttpResponse('<p>Пост</p>'), 'gzip'),
+            'картинка': (
+                HttpResponse(b'\0' * 1000, content_type='image/png'), 'gzip'
+            ),
+            'диапазон': (HttpResponse(HTML, status=206), 'gzip'),
+        }
+        for name, (response, accept) in cases.items():
+            with self.subTest(name=name):
+                response = self.process(response, HTTP_ACCEPT_ENCODING=accept)
+                self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_already_encoded(self):
+        original = HttpResponse(b'\x1f\x8b' * 200)
+        original['Content-Encoding'] = 'gzip'
+        response = self.process(original, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.content, b'\x1f\x8b' * 200)
+
+    def test_exempt(self):
+        view = compress_exempt(lambda request: HttpResponse('\n  ' + HTML))
+        middleware = CompressionMiddleware(view)
+        response = middleware(
+            self.factory.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content.decode(), '\n  ' + HTML)
+
+    def test_minify_setting(self):
+        for enabled, expected in ((True, '<p>\n<b>'), (False, '<p>\n  <b>')):
+            with self.subTest(enabled=enabled):
+                with override_settings(HTML_MINIFY=enabled):
+                    response = self.process(HttpResponse('<p>\n  <b>'))
+                self.assertEqual(response.content.decode(), expected)
+
+    def test_json_not_minified(self):
+        body = '{"text": "a\\n  b"}\n  '
+        response = self.process(
+            HttpResponse(body, content_type='application/json')
+        )
+        self.assertEqual(response.content.decode(), body)
+
+    def test_weak_etag(self):
+        original = HttpResponse(HTML)
+        original['ETag'] = '"abc"'
+        response = self.process(original, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+
+    @override_settings(COMPRESS_STREAM_FLUSH_SIZE=100)
+    def test_streaming(self):
+        """Поток сжимается частями, каждую можно распаковать сразу"""
+        lines = ['{"id": %s}\n' % number for number in range(100)]
+        original = StreamingHttpResponse(
+            iter(lines), content_type='application/x-ndjson'
+        )
+        original['Content-Length'] = '1000'
+        response = self.process(original, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        parts = [
+            decompressor.decompress(chunk)
+            for chunk in response.streaming_content
+        ]
+        parts = [part for part in parts if part]
+        self.assertGreater(len(parts), 5)
+        self.assertTrue(parts[0].startswith(b'{"id": 0}'))
+        self.assertEqual(b''.join(parts).decode(), ''.join(lines))
+
+
+class CompressedPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=author, text='Пост')
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_page(self):
+        """Страница сжимается и распаковывается в ту же разметку"""
+        plain = self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('posts:index'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertNotIn('\n  ', plain.content.decode())
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertLess(len(response.content), len(plain.content) / 2)
+        self.assertEqual(
+            gzip.decompress(response.content).decode(),
+            plain.content.decode().replace(
+                str(plain.context['csrf_token']),
+                str(response.context['csrf_token'])
+            )
+        )
+
+    def test_conditional_request(self):
+        """Ослабленный ETag сжатой страницы подходит для If-None-Match"""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        response = self.client.get(
+            url, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_ndjson_stream(self):
+        response = self.client.get(
+            reverse('api:posts'), {'format': 'ndjson'},
+            HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)
+        ).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines], [self.post.pk]
+        )
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from yatube.database import get_databases, get_search_backend
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite_by_default(self):
+        databases = get_databases('/srv', env={})
+        self.assertEqual(list(databases), ['default'])
+        default = databases['default']
+        self.assertEqual(default['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(default['NAME'], '/srv/db.sqlite3')
+        self.assertEqual(default['OPTIONS'], {'timeout': 20})
+        self.assertEqual(default['CONN_MAX_AGE'], 60)
+
+    def test_postgresql_with_replicas(self):
+        databases = get_databases('/srv', env={
+            'DB_ENGINE': 'postgresql',
+            'DB_HOST': 'db',
+            'DB_CONN_MAX_AGE': '300',
+            'DB_REPLICAS': 'replica-a, replica-b:6432',
+        })
+        self.assertEqual(
+            list(databases), ['default', 'replica_1', 'replica_2']
+        )
+        self.assertEqual(databases['default']['HOST'], 'db')
+        self.assertEqual(databases['default']['CONN_MAX_AGE'], 300)
+        self.assertEqual(
+            [(databases[alias]['HOST'], databases[alias]['PORT'])
+             for alias in ('replica_1', 'replica_2')],
+            [('replica-a', '5432'), ('replica-b', '6432')]
+        )
+        self.assertEqual(
+            databases['replica_1']['TEST'], {'MIRROR': 'default'}
+        )
+
+    def test_search_backend(self):
+        """FTS5 есть только в SQLite, для PostgreSQL — поиск через LIKE"""
+        for env, backend in (
+            ({}, 'posts.search.SQLiteFTSBackend'),
+            ({'DB_ENGINE': 'postgresql'}, 'posts.search.SimpleSearchBackend'),
+        ):
+            with self.subTest(env=env):
+                self.assertEqual(
+                    get_search_backend(get_databases('/srv', env=env)),
+                    backend
+                )
+
+    def test_pgbouncer(self):
+        default = get_databases('/srv', env={
+            'DB_ENGINE': 'postgresql', 'DB_POOLER': 'pgbouncer'
+        })['default']
+        self.assertTrue(default['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(default['CONN_MAX_AGE'], 0)
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            get_databases('/srv', env={'DB_ENGINE': 'oracle'})
+
+    def test_sqlite_pragmas(self):
+        """Новое соединение SQLite получает настройки из SQLITE_PRAGMAS"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        connections = ConnectionHandler(get_databases(directory, env={}))
+        connection = connections['default']
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertTrue(
+            os.path.exists(os.path.join(directory, 'db.sqlite3'))
+        )
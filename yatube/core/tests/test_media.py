@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..media import RangeNotSatisfiable, parse_range
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = bytes(range(100))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'a.gif'), 'wb') as f:
+            f.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.url = reverse('media', args=['posts/a.gif'])
+
+    def test_full_file(self):
+        """Файл отдаётся целиком с заголовками кеширования"""
+        response = self.guest_client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_conditional_get(self):
+        """Неизменившийся файл отдаётся как 304 по ETag и Last-Modified"""
+        response = self.guest_client.get(self.url)
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ):
+            with self.subTest(headers=headers):
+                not_modified = self.guest_client.get(self.url, **headers)
+                self.assertEqual(
+                    not_modified.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+
+    def test_range(self):
+        """Заголовок Range отдаёт часть файла"""
+        response = self.guest_client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT[10:20])
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+
+    def test_range_not_satisfiable(self):
+        response = self.guest_client.get(self.url, HTTP_RANGE='bytes=100-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_stale_if_range_gives_full_file(self):
+        """При устаревшем If-Range файл отдаётся целиком"""
+        response = self.guest_client.get(
+            self.url, HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+
+    def test_missing_and_outside_files(self):
+        for path in ('posts/missing.gif', '../manage.py', 'posts'):
+            with self.subTest(path=path):
+                response = self.guest_client.get('/media/' + path)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_proxy_modes(self):
+        """Файл отдаёт прокси по X-Accel-Redirect или X-Sendfile"""
+        for mode, header, value in (
+            ('x-accel-redirect', 'X-Accel-Redirect',
+             '/protected-media/posts/a.gif'),
+            ('x-sendfile', 'X-Sendfile',
+             os.path.join(TEMP_MEDIA_ROOT, 'posts', 'a.gif')),
+        ):
+            with self.subTest(mode=mode):
+                with self.settings(MEDIA_SERVE_MODE=mode):
+                    response = self.guest_client.get(self.url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(response[header], value)
+                self.assertEqual(response.content, b'')
+
+
+class ParseRangeTests(TestCase):
+    def test_parse_range(self):
+        for header, expected in (
+            ('bytes=0-9', (0, 10)),
+            ('bytes=90-', (90, 10)),
+            ('bytes=-5', (95, 5)),
+            ('bytes=-500', (0, 100)),
+            ('bytes=50-500', (50, 50)),
+            ('bytes=0-1,5-6', None),
+            ('bytes=9-3', None),
+            ('items=0-9', None),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(parse_range(header, 100), expected)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=100-200', 100)
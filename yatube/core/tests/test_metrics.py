@@ -0,0 +1,74 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from http import HTTPStatus
+
+from posts.models import User
+
+from ..metrics import Histogram
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_server_timing_header(self):
+        """Ответ содержит время SQL, шаблонов и полное время"""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="\d+ queries", '
+            r'tpl;dur=[\d.]+, total;dur=[\d.]+$'
+        )
+
+    def test_metrics_endpoint(self):
+        """/core/metrics отдаёт гистограммы по представлениям"""
+        staff_client = Client()
+        staff_client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        self.guest_client.get(reverse('posts:index'))
+        response = staff_client.get('/core/metrics')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode()
+        for line in (
+            '# TYPE yatube_request_duration_seconds histogram',
+            'yatube_requests_total{view="posts:index",status="200"}',
+            'yatube_db_queries_bucket{view="posts:index",le="+Inf"}',
+            'yatube_template_duration_seconds_count{view="posts:index"}',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, content)
+
+    def test_metrics_hidden_from_guests(self):
+        """Гостю и обычному пользователю /core/metrics не виден"""
+        user_client = Client()
+        user_client.force_login(User.objects.create_user(username='auth'))
+        for client in (self.guest_client, user_client):
+            with self.subTest(client=client):
+                response = client.get('/core/metrics')
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_metrics_allowed_ip(self):
+        """Сборщику с адреса из METRICS_ALLOWED_IPS вход не нужен"""
+        response = self.guest_client.get(
+            '/core/metrics', REMOTE_ADDR='10.0.0.5'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class HistogramTests(TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        """Корзины гистограммы накопительные"""
+        histogram = Histogram('test', 'Тест', labels=('view',),
+                              buckets=(1, 5))
+        for value in (0.5, 3, 10):
+            histogram.observe(('a',), value)
+        self.assertEqual(list(histogram.samples()), [
+            'test_bucket{view="a",le="1"} 1',
+            'test_bucket{view="a",le="5"} 2',
+            'test_bucket{view="a",le="+Inf"} 3',
+            'test_sum{view="a"} 13.5',
+            'test_count{view="a"} 3',
+        ])
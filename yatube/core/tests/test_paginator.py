@@ -0,0 +1,114 @@
+from django.core.paginator import Page
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase, TestCase
+
+from posts.models import Post, User
+
+from ..paginator import CursorPaginator, ElidedPaginator
+
+
+class ElidedPaginatorTests(SimpleTestCase):
+    def test_elided_page_range(self):
+        paginator = ElidedPaginator(range(1000), 10)
+        ellipsis = paginator.ELLIPSIS
+        for number, expected in (
+            (1, [1, 2, 3, ellipsis, 100]),
+            (5, [1, 2, 3, 4, 5, 6, 7, ellipsis, 100]),
+            (50, [1, ellipsis, 48, 49, 50, 51, 52, ellipsis, 100]),
+            (96, [1, ellipsis, 94, 95, 96, 97, 98, 99, 100]),
+            (100, [1, ellipsis, 98, 99, 100]),
+        ):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    paginator.get_elided_page_range(number), expected
+                )
+
+    def test_few_pages_not_elided(self):
+        paginator = ElidedPaginator(range(70), 10)
+        self.assertEqual(
+            paginator.get_elided_page_range(4), [1, 2, 3, 4, 5, 6, 7]
+        )
+
+    def test_navigation_size_does_not_grow(self):
+        """Разметка навигации одинакова для 100 и 200 000 страниц"""
+        sizes = []
+        for count in (1000, 2000000):
+            page = ElidedPaginator(range(count), 10).page(50)
+            html = render_to_string(
+                'posts/includes/paginator.html', {'page_obj': page}
+            )
+            self.assertEqual(html.count('class="page-item'), 12)
+            self.assertIn('<span class="page-link">50</span>', html)
+            sizes.append(len(html))
+        self.assertLess(abs(sizes[0] - sizes[1]), 50)
+
+
+class ApproximateCountTests(SimpleTestCase):
+    def setUp(self):
+        # Число постов упёрлось в count_limit: сколько их на самом деле,
+        # неизвестно
+        self.paginator = CursorPaginator(
+            Post.objects.all(), 10, count_limit=1000, count=1000
+        )
+
+    def test_last_pages_hidden(self):
+        ellipsis = self.paginator.ELLIPSIS
+        for number, expected in (
+            (1, [1, 2, 3, ellipsis]),
+            (50, [1, ellipsis, 48, 49, 50, 51, 52, ellipsis]),
+            (99, [1, ellipsis, 97, 98, 99, 100, ellipsis]),
+        ):
+            with self.subTest(number=number):
+                self.assertEqual(
+                    self.paginator.get_elided_page_range(number), expected
+                )
+
+    def test_exact_count_keeps_last_page(self):
+        paginator = CursorPaginator(
+            Post.objects.all(), 10, count_limit=1000, count=999
+        )
+        self.assertFalse(paginator.count_is_approximate)
+        self.assertEqual(paginator.get_elided_page_range(1)[-1], 100)
+
+    def test_no_last_link(self):
+        html = render_to_string(
+            'posts/includes/paginator.html',
+            {'page_obj': Page([], 50, self.paginator)}
+        )
+        self.assertNotIn('Последняя', html)
+        self.assertNotIn('page=100', html)
+        self.assertIn('Первая', html)
+
+
+class CursorPaginatorTests(TestCase):
+    def test_invalid_cursor_not_counted(self):
+        """Испорченный курсор: первая страница одним запросом, без COUNT"""
+        author = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=author, text=str(i)) for i in range(15)
+        )
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        with self.assertNumQueries(1):
+            page = paginator.get_cursor_page('broken')
+        self.assertEqual(page.number, 1)
+        self.assertEqual(len(page), 10)
+        self.assertIsNotNone(page.next_cursor)
+
+
+class PageQueryTests(SimpleTestCase):
+    def test_links_keep_query(self):
+        """Все ссылки навигации, и номерные и курсорные, сохраняют запрос"""
+        page = Page([], 2, ElidedPaginator(range(30), 10))
+        page.previous_cursor = 'prev'
+        page.next_cursor = 'next'
+        for template in (
+            'posts/includes/paginator.html',
+            'posts/includes/paginator_cursor.html',
+        ):
+            with self.subTest(template=template):
+                html = render_to_string(
+                    template, {'page_obj': page, 'page_query': 'q=a&'}
+                )
+                links = html.count('href="?')
+                self.assertGreater(links, 0)
+                self.assertEqual(html.count('href="?q=a&amp;'), links)
@@ -0,0 +1,182 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import (
+    Client, SimpleTestCase, TestCase, TransactionTestCase
+)
+from django.urls import reverse
+
+from posts.models import Comment, Post, User, UserCounters
+
+from .. import routers
+from ..management.commands.sync_replicas import copy_sqlite
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.addCleanup(routers.use_replica, None)
+
+    def test_reads_from_current_replica(self):
+        self.assertIsNone(self.router.db_for_read(Post))
+        routers.use_replica('replica_1')
+        self.assertEqual(self.router.db_for_read(Post), 'replica_1')
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_writes_go_to_primary(self):
+        routers.use_replica('replica_1')
+        self.router.db_for_write(User)
+        self.assertFalse(routers.has_written())
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertTrue(routers.has_written())
+        self.assertFalse(self.router.allow_migrate('replica_1', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+
+@mock.patch('core.routers.get_replicas', return_value=['replica_1'])
+class ReplicaMiddlewareTests(TestCase):
+    """
+    Реплик в тестах нет: выбранная реплика только записывается,
+    а запросы идут в тестовую базу.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовая')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.chosen = []
+        patcher = mock.patch(
+            'core.routers.use_replica', side_effect=self.record
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def record(self, alias):
+        if alias is not None:
+            self.chosen.append(alias)
+        routers._local.replica = None
+        routers._local.wrote = False
+
+    def test_feed_views_read_from_replica(self, get_replicas):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:profile', args=['auth']),
+        ):
+            with self.subTest(url=url):
+                self.chosen.clear()
+                self.authorized_client.get(url)
+                self.assertEqual(self.chosen, ['replica_1'])
+        self.chosen.clear()
+        self.authorized_client.get(reverse('posts:post_create'))
+        self.assertEqual(self.chosen, [])
+
+    def test_write_sticks_to_primary(self, get_replicas):
+        """После записи пользователь какое-то время читает из основной"""
+        response = self.authorized_client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'}
+        )
+        self.assertTrue(Comment.objects.exists())
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        self.authorized_client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertEqual(self.chosen, [])
+        guest = Client()
+        guest.get(reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertEqual(self.chosen, ['replica_1'])
+
+    def test_incidental_write_not_sticky(self, get_replicas):
+        """Запись счётчиков при чтении профиля не ставит cookie"""
+        UserCounters.objects.filter(user=self.user).delete()
+        response = Client().get(reverse('posts:profile', args=['auth']))
+        self.assertTrue(UserCounters.objects.filter(user=self.user).exists())
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_stale_sticky_cookie_ignored(self, get_replicas):
+        self.authorized_client.cookies[settings.REPLICA_STICKY_COOKIE] = '1'
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(self.chosen, ['replica_1'])
+
+
+class SyncReplicasTests(TransactionTestCase):
+    def test_copy_sqlite(self):
+        """
+        Реплика получает копию основной базы. Копируются только
+        зафиксированные данные, поэтому тест без общей транзакции.
+        """
+        Post.objects.create(
+            author=User.objects.create_user(username='auth'), text='Копия'
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'replica.sqlite3')
+        connection.ensure_connection()
+        copy_sqlite(connection.connection, path)
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute(
+            'SELECT text FROM {}'.format(Post._meta.db_table)
+        ).fetchall(), [('Копия',)])
+
+
+REPLICA_DIR = tempfile.mkdtemp()
+
+
+@mock.patch('core.routers.get_replicas', return_value=['replica_1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Настоящая реплика — копия тестовой базы в отдельном файле SQLite:
+    чтение после записи идёт в основную базу, а после окончания
+    REPLICA_STICKY_SECONDS — снова на отстающую реплику.
+    """
+
+    databases = {'default', 'replica_1'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.replica_path = os.path.join(REPLICA_DIR, 'replica.sqlite3')
+        connections.databases['replica_1'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': cls.replica_path,
+            'TEST': {'NAME': cls.replica_path},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica_1'].close()
+        del connections.databases['replica_1']
+        delattr(connections._connections, 'replica_1')
+        shutil.rmtree(REPLICA_DIR, ignore_errors=True)
+
+    def test_read_after_write(self, get_replicas):
+        user = User.objects.create_user(username='auth')
+        post = Post.objects.create(author=user, text='Старый текст')
+        connection.ensure_connection()
+        copy_sqlite(connection.connection, self.replica_path)
+        client = Client()
+        client.force_login(user)
+        url = reverse('posts:post_detail', args=[post.pk])
+        response = client.post(
+            reverse('posts:post_edit', args=[post.pk]), {'text': 'Новый текст'}
+        )
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        self.assertContains(client.get(url), 'Новый текст')
+        expired = time.time() + settings.REPLICA_STICKY_SECONDS + 1
+        with mock.patch('core.middleware.time.time', return_value=expired):
+            self.assertContains(client.get(url), 'Старый текст')
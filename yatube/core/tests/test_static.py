@@ -0,0 +1,150 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client, TestCase, override_settings
+
+from ..static import accepted_encodings
+
+CSS = b'.post { margin: 0 auto; }\n' * 100
+# Остальные файлы из {% static %} в шаблонах: без них в манифесте
+# страницы (в том числе 404) не собираются
+TEMPLATE_FILES = (
+    'css/bootstrap.min.css', 'js/bootstrap.min.js', 'img/fav/favicon.ico',
+    'img/fav/apple-touch-icon.png', 'img/fav/favicon-32x32.png',
+    'img/fav/favicon-16x16.png',
+)
+
+
+class StaticFilesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp()
+        cls.root = tempfile.mkdtemp()
+        for name in TEMPLATE_FILES:
+            path = os.path.join(cls.source, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'wb').close()
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'wb') as f:
+            f.write(CSS)
+        with open(os.path.join(cls.source, 'img', 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG' + bytes(range(256)) * 4)
+        cls.settings = override_settings(
+            STATICFILES_DIRS=[cls.source], STATIC_ROOT=cls.root
+        )
+        cls.settings.enable()
+        call_command(
+            'collectstatic', interactive=False, verbosity=0,
+            ignore_patterns=['admin']
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        self.css = staticfiles_storage.stored_name('css/site.css')
+
+    def test_collectstatic(self):
+        """Файлы получают хеш в имени, сжимаемые — вариант .gz"""
+        self.assertRegex(self.css, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertEqual(static('css/site.css'), '/static/' + self.css)
+        with open(os.path.join(self.root, self.css + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), CSS)
+        logo = staticfiles_storage.stored_name('img/logo.png')
+        self.assertFalse(os.path.exists(os.path.join(self.root, logo + '.gz')))
+
+    def test_gzip_variant(self):
+        response = self.client.get(
+            static('css/site.css'), HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), CSS
+        )
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_brotli_preferred(self):
+        with open(os.path.join(self.root, self.css + '.br'), 'wb') as f:
+            f.write(b'brotli')
+        self.addCleanup(os.remove, os.path.join(self.root, self.css + '.br'))
+        for header, encoding in (
+            ('gzip, br', 'br'),
+            ('gzip, br;q=0', 'gzip'),
+            ('*', 'br'),
+        ):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    static('css/site.css'), HTTP_ACCEPT_ENCODING=header
+                )
+                self.assertEqual(response['Content-Encoding'], encoding)
+
+    def test_uncompressed(self):
+        for header in ('', 'identity', 'gzip;q=0'):
+            with self.subTest(header=header):
+                response = self.client.get(
+                    static('css/site.css'), HTTP_ACCEPT_ENCODING=header
+                )
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(b''.join(response.streaming_content), CSS)
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_unhashed_name_not_immutable(self):
+        response = self.client.get('/static/css/site.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_conditional_request(self):
+        response = self.client.get(
+            static('css/site.css'), HTTP_ACCEPT_ENCODING='gzip'
+        )
+        response = self.client.get(
+            static('css/site.css'), HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_from_manifest(self):
+        """Файла нет в манифесте: ошибка, а не адрес без хеша"""
+        with self.assertRaisesMessage(ValueError, 'css/missing.css'):
+            static('css/missing.css')
+
+    def test_missing(self):
+        for path in ('css/missing.css', '../settings.py'):
+            with self.subTest(path=path):
+                response = self.client.get('/static/' + path)
+                self.assertEqual(response.status_code, 404)
+
+
+class StaticWithoutCollectTests(TestCase):
+    def test_url_without_manifest(self):
+        """До collectstatic адреса строятся без хеша"""
+        with override_settings(STATIC_ROOT=tempfile.gettempdir()):
+            self.assertEqual(static('img/logo.png'), '/static/img/logo.png')
+
+
+class AcceptEncodingTests(TestCase):
+    def test_parse(self):
+        for header, expected in (
+            ('', set()),
+            ('gzip', {'gzip'}),
+            ('GZIP, br;q=0.5', {'gzip', 'br'}),
+            ('br;q=0, gzip;q=1.0', {'gzip'}),
+            ('*;q=0.1, gzip;q=0', {'br', '*'}),
+            ('gzip;q=abc', set()),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(accepted_encodings(header), expected)
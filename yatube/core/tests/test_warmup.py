@@ -0,0 +1,107 @@
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.template import engines
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import get_resolver, reverse
+
+from posts.models import Post, User
+
+from ..warmup import warm_templates, warm_up
+
+
+class WarmTemplatesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Post.objects.create(
+            author=User.objects.create_user(username='auth'), text='Пост'
+        )
+
+    def test_templates_cached(self):
+        """Прогрев разбирает шаблоны проекта и приложений"""
+        compiled, failed = warm_templates()
+        self.assertGreater(compiled, 0)
+        self.assertEqual(failed, 0)
+        loader = engines.all()[0].engine.template_loaders[0]
+        for name in (
+            'base.html',
+            'posts/includes/paginator.html',
+            'admin/base.html',
+        ):
+            with self.subTest(name=name):
+                self.assertIn(name, loader.get_template_cache)
+
+    def test_pages_render_without_reading_templates(self):
+        """После прогрева страницы не читают шаблоны с диска"""
+        warm_templates()
+        with mock.patch(
+            'django.template.loaders.filesystem.Loader.get_contents',
+            side_effect=AssertionError('шаблон читается с диска'),
+        ):
+            for url in (
+                reverse('posts:index'),
+                reverse('posts:profile', args=['auth']),
+                reverse('about:author'),
+            ):
+                with self.subTest(url=url):
+                    response = Client().get(url)
+                    self.assertEqual(response.status_code, 200)
+
+
+class WarmUpTests(SimpleTestCase):
+    def test_all_steps_reported(self):
+        """Отчёт содержит время и результат каждого шага по порядку"""
+        with self.assertLogs('core.warmup', 'INFO') as logs:
+            report = warm_up()
+        self.assertEqual(
+            [name for name, seconds, result in report],
+            list(settings.WARMUP_STEPS)
+        )
+        for name, seconds, result in report:
+            with self.subTest(name=name):
+                self.assertGreaterEqual(seconds, 0)
+                self.assertFalse(result.startswith('ошибка'))
+        self.assertIn('всего', logs.output[-1])
+        self.assertTrue(get_resolver()._populated)
+
+    def test_selected_steps(self):
+        with self.assertLogs('core.warmup', 'INFO'):
+            report = warm_up(['urls', 'i18n'])
+        self.assertEqual(
+            [name for name, seconds, result in report], ['urls', 'i18n']
+        )
+
+    def test_unknown_steps_skipped(self):
+        """Опечатка в WARMUP записывается в журнал и не роняет запуск"""
+        with self.assertLogs('core.warmup', 'INFO') as logs:
+            report = warm_up(['urls', 'missing', 'i18n'])
+        self.assertEqual(
+            [name for name, seconds, result in report], ['urls', 'i18n']
+        )
+        self.assertIn('WARNING', logs.output[0])
+        self.assertIn('Нет шагов прогрева: missing', logs.output[0])
+
+    def test_failed_step_does_not_stop_others(self):
+        with mock.patch(
+            'core.warmup.warm_images', side_effect=OSError('нет libjpeg')
+        ), self.assertLogs('core.warmup', 'INFO') as logs:
+            report = dict(
+                (name, result) for name, seconds, result in warm_up()
+            )
+        self.assertEqual(report['images'], 'ошибка: нет libjpeg')
+        self.assertEqual(report['i18n'], settings.LANGUAGE_CODE)
+        self.assertIn('Шаг прогрева images не выполнен', logs.output[0])
+
+    def test_command(self):
+        out = StringIO()
+        with self.assertLogs('core.warmup', 'INFO'):
+            call_command('warmup', 'urls', 'admin', stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(
+            [line.split()[0] for line in lines], ['urls', 'admin', 'всего']
+        )
+        with self.assertRaises(CommandError):
+            call_command('warmup', 'missing')
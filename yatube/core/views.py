@@ -1,4 +1,16 @@
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from . import media, static
+from .metrics import REGISTRY
 
 
 def page_not_found(request, exception):
@@ -19,3 +31,85 @@ def server_error(request):
 def permission_denied_view(request, exception):
     """Функция хендлера 403"""
     return render(request, 'core/403.html', {'path': request.path}, status=403)
+
+
+def metrics(request):
+    """
+    Метрики запросов процесса в текстовом формате Prometheus.
+    Видны сотрудникам и адресам из METRICS_ALLOWED_IPS, остальным — 404.
+    """
+    if not (request.user.is_staff
+            or request.META.get('REMOTE_ADDR')
+            in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+    return HttpResponse(
+        REGISTRY.expose(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Загруженные файлы из MEDIA_ROOT: условные запросы по ETag
+    и Last-Modified, диапазоны байт, отдача через прокси по
+    X-Accel-Redirect или X-Sendfile (настройка MEDIA_SERVE_MODE).
+    """
+    full_path = media.get_media_path(path)
+    stat = os.stat(full_path)
+    etag = media.file_etag(stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        header = media.redirect_header(path, full_path)
+        if header is None:
+            response = media.file_response(
+                request, full_path, stat, etag
+            )
+        else:
+            response = HttpResponse(
+                content_type=media.get_content_type(full_path)
+            )
+            response[header[0]] = header[1]
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    patch_cache_control(
+        response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE
+    )
+    return response
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Файлы из STATIC_ROOT, собранные collectstatic: сжатый заранее
+    вариант .br или .gz по Accept-Encoding, файлы с хешем в имени
+    кешируются браузером навсегда.
+    """
+    full_path = static.get_static_path(path)
+    variant, encoding = static.choose_variant(request, full_path)
+    stat = os.stat(variant)
+    etag = media.file_etag(stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = media.file_response(request, variant, stat, etag)
+        response['Content-Type'] = media.get_content_type(full_path)
+        if encoding is not None:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if static.has_variants(full_path):
+        patch_vary_headers(response, ['Accept-Encoding'])
+    if static.is_immutable(path):
+        patch_cache_control(
+            response, public=True, max_age=settings.STATIC_IMMUTABLE_MAX_AGE,
+            immutable=True
+        )
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.STATIC_CACHE_MAX_AGE
+        )
+    return response
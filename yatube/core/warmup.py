@@ -0,0 +1,176 @@
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import URLResolver, get_resolver
+from django.utils import formats, timezone, translation
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+def iter_template_names(directories):
+    """Имена всех файлов шаблонов в каталогах, как их ищет загрузчик"""
+    for directory in directories:
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [name for name in dirs if not name.startswith('.')]
+            for name in files:
+                if not name.startswith('.'):
+                    path = os.path.join(root, name)
+                    yield os.path.relpath(path, directory).replace(
+                        os.sep, '/'
+                    )
+
+
+def get_loader_dirs(loaders):
+    """Каталоги загрузчиков, включая вложенные в кеширующий"""
+    for loader in loaders:
+        yield from get_loader_dirs(getattr(loader, 'loaders', ()))
+        if hasattr(loader, 'get_dirs'):
+            yield from loader.get_dirs()
+
+
+def warm_templates():
+    """
+    Разбирает все шаблоны каталогов DIRS и templates/ приложений,
+    чтобы кеширующий загрузчик хранил их до первого запроса.
+    Возвращает число разобранных шаблонов и шаблонов с ошибками.
+    """
+    compiled = failed = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        directories = get_loader_dirs(engine.template_loaders)
+        for name in sorted(set(iter_template_names(directories))):
+            try:
+                engine.get_template(name)
+            except (TemplateSyntaxError, UnicodeDecodeError):
+                logger.exception('Шаблон %s не разобран', name)
+                failed += 1
+            else:
+                compiled += 1
+    return compiled, failed
+
+
+def warm_urls():
+    """
+    Списки reverse всех URLconf и регулярные выражения адресов:
+    иначе они строятся первым reverse и первым resolve процесса.
+    """
+    count = 0
+    resolvers = [get_resolver()]
+    while resolvers:
+        resolver = resolvers.pop()
+        resolver.reverse_dict
+        for pattern in resolver.url_patterns:
+            pattern.pattern.regex
+            if isinstance(pattern, URLResolver):
+                resolvers.append(pattern)
+            else:
+                count += 1
+    return 'адресов: {}'.format(count)
+
+
+def warm_admin():
+    """Адреса моделей админки"""
+    from django.contrib import admin
+
+    for model_admin in admin.site._registry.values():
+        model_admin.urls
+    return 'моделей: {}'.format(len(admin.site._registry))
+
+
+def warm_templates_step():
+    compiled, failed = warm_templates()
+    return 'шаблонов: {}, с ошибками: {}'.format(compiled, failed)
+
+
+def warm_thumbnails():
+    """Движок, хранилища и бэкенд sorl.thumbnail"""
+    from sorl.thumbnail import default
+
+    return ', '.join(
+        wrapper.__class__.__name__ for wrapper in (
+            default.backend, default.kvstore, default.engine, default.storage,
+        )
+    )
+
+
+def warm_images():
+    """Все модули форматов Pillow, которые иначе ищутся при открытии"""
+    from PIL import Image
+
+    Image.init()
+    return 'форматов: {}'.format(len(Image.OPEN))
+
+
+def warm_i18n():
+    """Каталог переводов, форматы дат языка сайта и часовой пояс"""
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('Home')
+        for name in ('DATE_FORMAT', 'DATETIME_FORMAT', 'DATE_INPUT_FORMATS'):
+            formats.get_format(name)
+    timezone.get_default_timezone()
+    return settings.LANGUAGE_CODE
+
+
+def get_unknown_steps(names):
+    """Имена, которых нет в WARMUP_STEPS, по алфавиту"""
+    return sorted(set(names) - set(settings.WARMUP_STEPS))
+
+
+def run_steps(names):
+    """
+    Выполняет шаги прогрева из WARMUP_STEPS по порядку.
+    Ошибка шага записывается в журнал и не мешает остальным.
+    Возвращает отчёт: [(шаг, секунды, результат)].
+    """
+    report = []
+    for name in names:
+        step = import_string(settings.WARMUP_STEPS[name])
+        started = time.perf_counter()
+        try:
+            result = step()
+        except Exception as error:
+            logger.exception('Шаг прогрева %s не выполнен', name)
+            result = 'ошибка: {}'.format(error)
+        report.append((name, time.perf_counter() - started, result))
+    return report
+
+
+def format_report(report):
+    lines = [
+        '{:<12} {:>8.1f} мс  {}'.format(name, seconds * 1000, result)
+        for name, seconds, result in report
+    ]
+    lines.append('{:<12} {:>8.1f} мс'.format(
+        'всего', sum(seconds for name, seconds, result in report) * 1000
+    ))
+    return lines
+
+
+def warm_up(names=None):
+    """
+    Прогрев процесса перед обработкой запросов: шаги WARMUP_STEPS,
+    по умолчанию все. Вызывается из wsgi.py: при запуске gunicorn
+    с --preload прогрев выполняется один раз в главном процессе,
+    и рабочие процессы получают готовые объекты после fork как общую
+    память копирования при записи. Соединения с базой закрываются,
+    чтобы рабочие процессы не унаследовали их.
+    """
+    names = names or list(settings.WARMUP_STEPS)
+    unknown = get_unknown_steps(names)
+    if unknown:
+        # Опечатка в WARMUP не должна останавливать запуск сервера
+        logger.warning('Нет шагов прогрева: %s', ', '.join(unknown))
+        names = [name for name in names if name not in unknown]
+    report = run_steps(names)
+    connections.close_all()
+    for line in format_report(report):
+        logger.info('Прогрев: %s', line)
+    return report
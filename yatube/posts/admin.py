@@ -1,6 +1,8 @@
+from django.conf import settings
 from django.contrib import admin
 
 from .models import Post, Group, Comment, Follow
+from .search import get_backend
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -16,6 +18,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу вместо LIKE по всей таблице"""
+        if not search_term:
+            return queryset, False
+        post_ids = get_backend().search(
+            search_term, settings.SEARCH_MAX_RESULTS
+        )
+        return queryset.filter(pk__in=post_ids), False
+
 
 class CommentAdmin(admin.ModelAdmin):
     list_display = (
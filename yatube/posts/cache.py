@@ -0,0 +1,181 @@
+import hashlib
+import json
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.core.paginator import Page
+from django.template.loader import render_to_string
+
+from .models import Post
+from .utils import get_comment_paginator, get_paginator, paginate
+
+
+FEED_VERSION_KEY = 'posts:feed_version'
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+COMMENTS_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Что выводит карточка поста на разных страницах
+CARD_VARIANTS = {
+    'index': {'show_author': True, 'author_link': True},
+    'group': {'show_author': True, 'author_posts_link': True},
+    'profile': {},
+    'follow': {'show_author': True},
+}
+
+
+def get_feed_version():
+    """
+    Текущая версия ленты.
+    Версия входит во все ключи кеша ленты, поэтому её смена
+    разом делает недействительными все закешированные страницы.
+    """
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        cache.add(FEED_VERSION_KEY, uuid4().hex, None)
+        version = cache.get(FEED_VERSION_KEY)
+    return version
+
+
+def invalidate_feed():
+    """
+    Сбрасывает кеш ленты: следующее чтение выдаст новую версию.
+    Версия удаляется, а не перезаписывается, чтобы двухуровневый кеш
+    разослал её смену всем процессам.
+    """
+    cache.delete(FEED_VERSION_KEY)
+
+
+def get_page_key(request):
+    """Часть ключа кеша, определяющая страницу: курсор или номер"""
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return 'cursor:' + hashlib.md5(cursor.encode()).hexdigest()
+    page = request.GET.get('page', '')
+    return 'page:' + (page if page.isdigit() else '1')
+
+
+def get_feed_cache_key(request, name):
+    return 'posts:{}:{}:{}'.format(
+        name, get_feed_version(), get_page_key(request)
+    )
+
+
+def refresh_comments_counts(posts):
+    """
+    Число комментариев постов закешированной страницы одним запросом
+    по первичному ключу. Комментарий не сбрасывает версию ленты:
+    на странице меняется только его карточка.
+    """
+    counts = dict(
+        Post.objects.filter(
+            pk__in=[post.pk for post in posts]
+        ).values_list('pk', 'comments_count')
+    )
+    for post in posts:
+        post.comments_count = counts.get(post.pk, post.comments_count)
+
+
+def get_comments_version(posts):
+    """Часть ключа фрагмента страницы: числа комментариев её постов"""
+    counts = [[post.pk, post.comments_count] for post in posts]
+    return hashlib.md5(json.dumps(counts).encode()).hexdigest()
+
+
+def get_cached_page(request, name, post_list, **kwargs):
+    """
+    Страница ленты из кеша по ключу (лента, версия, страница).
+    При промахе страница выбирается из базы через paginate
+    и кешируется без пагинатора: посты, номер, курсоры и count.
+    Возвращает страницу и ключ кеша фрагмента, который учитывает
+    и числа комментариев постов страницы.
+    """
+    key = get_feed_cache_key(request, name)
+    data = cache.get(key)
+    if data is None:
+        page = paginate(request, post_list, **kwargs)
+        data = {
+            'object_list': list(page.object_list),
+            'number': page.number,
+            'next_cursor': page.next_cursor,
+            'previous_cursor': page.previous_cursor,
+            # count уже посчитан только для номерных страниц
+            'count': vars(page.paginator).get('count'),
+        }
+        cache.set(key, data, FEED_CACHE_TIMEOUT)
+    else:
+        refresh_comments_counts(data['object_list'])
+        paginator = get_paginator(post_list, **kwargs)
+        if data['count'] is not None:
+            paginator.count = data['count']
+        page = Page(data['object_list'], data['number'], paginator)
+        page.next_cursor = data['next_cursor']
+        page.previous_cursor = data['previous_cursor']
+    return page, '{}:{}'.format(key, get_comments_version(page.object_list))
+
+
+def get_post_version(post):
+    """
+    Версия карточки поста: хеш всех выводимых в ней полей поста,
+    автора и группы. Изменение поста, числа комментариев, группы
+    или имени автора даёт новую версию, и старая карточка больше
+    не читается, а истекает сама.
+    """
+    group = post.group
+    values = [
+        post.text,
+        post.pub_date.isoformat(),
+        post.image.name,
+        post.comments_count,
+        post.author.username,
+        post.author.get_full_name(),
+        group and [group.title, group.slug],
+    ]
+    return hashlib.md5(
+        json.dumps(values, ensure_ascii=False).encode()
+    ).hexdigest()
+
+
+def get_card_key(post, variant):
+    return 'posts:card:{}:{}:{}'.format(
+        variant, post.pk, get_post_version(post)
+    )
+
+
+def render_cards(posts, variant):
+    """
+    Список HTML карточек постов. Готовые карточки читаются одним
+    cache.get_many, отрисовываются и кешируются одним set_many
+    только недостающие.
+    Карточка не зависит от зрителя, поэтому общая для всех.
+    """
+    options = CARD_VARIANTS[variant]
+    keys = [get_card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if key not in cards:
+            missing[key] = render_to_string(
+                CARD_TEMPLATE, {'post': post, **options}
+            )
+    if missing:
+        cache.set_many(missing, CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [cards[key] for key in keys]
+
+
+def get_first_comments(post):
+    """
+    Первая страница комментариев поста и курсор следующей.
+    Ключ кеша содержит дату изменения поста: новый, изменённый или
+    удалённый комментарий и новое имя комментатора меняют её, и
+    страница выбирается заново.
+    """
+    key = 'posts:comments:{}:{}'.format(post.pk, post.updated.timestamp())
+    data = cache.get(key)
+    if data is None:
+        page = get_comment_paginator(post.pk).first_page()
+        data = (list(page.object_list), page.next_cursor)
+        cache.set(key, data, COMMENTS_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,233 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, search
+from .models import Comment
+
+
+logger = logging.getLogger(__name__)
+
+# Ещё не записанные комментарии пользователя хранятся в его сессии,
+# чтобы он видел их на странице поста в любом процессе
+PENDING_SESSION_KEY = 'pending_comments'
+PENDING_LIMIT = 20
+# Комментарий, не появившийся в базе за это время, считается потерянным
+PENDING_TTL = timedelta(minutes=5)
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+class QueueFull(Exception):
+    """Очередь заполнена и не освободилась за COMMENT_QUEUE_PUT_TIMEOUT"""
+
+
+def write_comments(comments):
+    """
+    Сохраняет пачку комментариев одним bulk_create в одной транзакции.
+    bulk_create не вызывает сигналы, поэтому число комментариев
+    и поисковый индекс обновляются здесь: счётчик — по разу
+    на пост, индекс — одним запросом по постам пачки и времени
+    её создания (SQLite не возвращает id из bulk_create).
+    """
+    per_post = Counter(comment.post_id for comment in comments)
+    with transaction.atomic():
+        Comment.objects.bulk_create(comments)
+        for post_id, count in per_post.items():
+            counters.change_comments_count(post_id, count)
+        search.get_backend().index_new_comments(
+            per_post, min(comment.created for comment in comments)
+        )
+
+
+def write_one_by_one(comments):
+    """
+    Запасной путь для пачки, которая не записалась целиком (например,
+    пост удалён): остальные комментарии не теряются.
+    """
+    for comment in comments:
+        comment.pk = None
+        try:
+            comment.save()
+        except Exception:
+            logger.exception(
+                'Комментарий к посту %s не записан', comment.post_id
+            )
+
+
+class CommentQueue:
+    """
+    Очередь комментариев процесса.
+    Фоновый поток ждёт первый комментарий, добирает пачку до batch_size
+    за flush_interval секунд и записывает её через write_comments:
+    блокировка записи SQLite берётся один раз на пачку, а не на каждый
+    комментарий. Комментарии в очереди хранятся только в памяти и
+    теряются при аварийной остановке процесса.
+    """
+
+    def __init__(self, max_size, batch_size, flush_interval, put_timeout):
+        self.queue = queue.Queue(max_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.thread = None
+
+    def put(self, comment):
+        """
+        Ставит комментарий в очередь. Полная очередь задерживает
+        запрос на put_timeout секунд, затем вызывает QueueFull.
+        """
+        try:
+            self.queue.put(comment, timeout=self.put_timeout)
+        except queue.Full:
+            raise QueueFull
+
+    def take_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def take_ready(self):
+        """Пачка из уже стоящих в очереди комментариев, без ожидания"""
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def write(self, batch):
+        try:
+            write_comments(batch)
+        except Exception:
+            logger.exception(
+                'Пачка из %s комментариев не записана', len(batch)
+            )
+            write_one_by_one(batch)
+
+    def flush(self):
+        """Записывает всё, что стоит в очереди, возвращает число записей"""
+        total = 0
+        batch = self.take_ready()
+        while batch:
+            self.write(batch)
+            total += len(batch)
+            batch = self.take_ready()
+        return total
+
+    def run(self):
+        while True:
+            self.write(self.take_batch())
+            # Поток живёт всё время процесса: соединение закрывается
+            # по CONN_MAX_AGE и после ошибок, как в конце запроса
+            connection.close_if_unusable_or_obsolete()
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.run, name='comment-queue', daemon=True
+        )
+        self.thread.start()
+
+
+def get_queue():
+    """
+    Очередь процесса, создаётся при первом комментарии. При выходе
+    процесса оставшиеся в ней комментарии дописываются.
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = CommentQueue(
+                max_size=settings.COMMENT_QUEUE_SIZE,
+                batch_size=settings.COMMENT_QUEUE_BATCH_SIZE,
+                flush_interval=settings.COMMENT_QUEUE_FLUSH_INTERVAL,
+                put_timeout=settings.COMMENT_QUEUE_PUT_TIMEOUT,
+            )
+            _queue.start()
+            atexit.register(_queue.flush)
+        return _queue
+
+
+def save_comment(request, comment):
+    """
+    Сохраняет комментарий сразу или, при COMMENT_QUEUE_ENABLED,
+    ставит в очередь и запоминает в сессии автора до записи.
+    """
+    if not settings.COMMENT_QUEUE_ENABLED:
+        comment.save()
+        return
+    # Время берётся до put(): поток очереди может записать комментарий
+    # сразу, и его created должен быть не раньше queued
+    queued = timezone.now()
+    get_queue().put(comment)
+    pending = request.session.get(PENDING_SESSION_KEY, [])
+    pending.append({
+        'post': comment.post_id,
+        'text': comment.text,
+        'queued': queued.isoformat(),
+    })
+    request.session[PENDING_SESSION_KEY] = pending[-PENDING_LIMIT:]
+
+
+def find_written(item, saved):
+    """Записанный комментарий для элемента сессии: тот же текст, не раньше"""
+    queued = parse_datetime(item['queued'])
+    for comment in saved:
+        if comment.text == item['text'] and comment.created >= queued:
+            return comment
+    return None
+
+
+def get_pending(request, post_id):
+    """
+    Ещё не записанные комментарии зрителя к посту.
+    Элементы сессии сверяются с комментариями зрителя к посту,
+    записанными после самого раннего из них; появившиеся в базе
+    и потерянные убираются из сессии.
+    """
+    pending = request.session.get(PENDING_SESSION_KEY)
+    items = [item for item in pending or () if item['post'] == post_id]
+    if not items:
+        return []
+    saved = list(Comment.objects.filter(
+        post_id=post_id,
+        author=request.user,
+        created__gte=min(parse_datetime(item['queued']) for item in items),
+    ).only('text', 'created'))
+    expired = timezone.now() - PENDING_TTL
+    kept = [item for item in pending if item['post'] != post_id]
+    comments = []
+    for item in items:
+        written = find_written(item, saved)
+        if written is not None:
+            saved.remove(written)
+        elif parse_datetime(item['queued']) > expired:
+            kept.append(item)
+            comments.append(Comment(
+                post_id=post_id,
+                author=request.user,
+                text=item['text'],
+                created=parse_datetime(item['queued']),
+            ))
+    if kept != pending:
+        request.session[PENDING_SESSION_KEY] = kept
+    return comments
@@ -0,0 +1,88 @@
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Comment, Follow, Post, UserCounters
+
+
+def recount_user(user_id):
+    """Считает счётчики пользователя по базе и сохраняет их"""
+    counters, _ = UserCounters.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(user_id=user_id).count(),
+        }
+    )
+    return counters
+
+
+def get_user_counters(user):
+    """Счётчики пользователя; при первом обращении они считаются по базе"""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def increment(user_id, field):
+    """
+    Увеличивает счётчик пользователя на единицу.
+    Если счётчиков ещё нет, они считаются по базе, где новая запись
+    уже есть.
+    """
+    changed = UserCounters.objects.filter(user_id=user_id).update(
+        updated=timezone.now(), **{field: F(field) + 1}
+    )
+    if not changed:
+        recount_user(user_id)
+
+
+def decrement(user_id, field):
+    """
+    Уменьшает счётчик пользователя на единицу.
+    Пользователь может удаляться вместе со своими записями,
+    поэтому отсутствующие счётчики не создаются.
+    """
+    UserCounters.objects.filter(
+        user_id=user_id, **{field + '__gt': 0}
+    ).update(updated=timezone.now(), **{field: F(field) - 1})
+
+
+def change_comments_count(post_id, delta):
+    """Изменяет число комментариев поста на delta"""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(
+        comments_count=F('comments_count') + delta, updated=timezone.now()
+    )
+
+
+def count_by(queryset, field):
+    """Словарь {значение поля: число записей} одним GROUP BY"""
+    return dict(
+        queryset.order_by().values_list(field).annotate(total=Count('pk'))
+    )
+
+
+def compute_user_counters():
+    """Ожидаемые счётчики всех пользователей, у которых они ненулевые"""
+    posts = count_by(Post.objects.all(), 'author')
+    followers = count_by(Follow.objects.all(), 'author')
+    following = count_by(Follow.objects.all(), 'user')
+    return {
+        user_id: (
+            posts.get(user_id, 0),
+            followers.get(user_id, 0),
+            following.get(user_id, 0),
+        )
+        for user_id in set(posts) | set(followers) | set(following)
+    }
+
+
+def compute_comments_counts():
+    """Ожидаемое число комментариев постов, у которых они есть"""
+    return count_by(Comment.objects.all(), 'post')
@@ -0,0 +1,124 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
+
+from .comment_queue import PENDING_SESSION_KEY
+from .models import Comment, Group, Post, User, UserCounters
+
+
+def touch_user(user_id):
+    """Имя пользователя изменилось: профиль и его посты устарели"""
+    now = timezone.now()
+    UserCounters.objects.filter(user_id=user_id).update(updated=now)
+    commented = Comment.objects.filter(author_id=user_id).values('post')
+    Post.objects.filter(
+        Q(author_id=user_id) | Q(pk__in=commented)
+    ).update(updated=now)
+
+
+def touch_groups(group_ids):
+    """Состав постов групп изменился"""
+    group_ids = {group_id for group_id in group_ids if group_id is not None}
+    if group_ids:
+        Group.objects.filter(pk__in=group_ids).update(updated=timezone.now())
+
+
+def touch_group_posts(group_id):
+    """Название или адрес группы выводятся на страницах её постов"""
+    Post.objects.filter(group_id=group_id).update(updated=timezone.now())
+
+
+def touch_post(post_id):
+    Post.objects.filter(pk=post_id).update(updated=timezone.now())
+
+
+def latest_post_update(**filters):
+    """Подзапрос: последнее изменение постов, выбранное по индексу"""
+    return Subquery(
+        Post.objects.filter(**filters).order_by('-updated').values(
+            'updated'
+        )[:1]
+    )
+
+
+def post_last_changed(post_id):
+    """Пост и комментарии к нему, число постов автора"""
+    return Post.objects.filter(pk=post_id).values_list(
+        'updated', 'author__counters__updated'
+    ).first()
+
+
+def profile_last_changed(username):
+    """Счётчики и имя автора, его посты"""
+    return User.objects.filter(username=username).values_list(
+        'counters__updated',
+        latest_post_update(author=OuterRef('pk')),
+    ).first()
+
+
+def group_last_changed(slug):
+    """Группа, состав и содержимое её постов"""
+    return Group.objects.filter(slug=slug).values_list(
+        'updated',
+        latest_post_update(group=OuterRef('pk')),
+    ).first()
+
+
+def get_etag(request, name, last_changed):
+    """
+    ETag страницы зрителя: страница зависит ещё и от того, кто смотрит
+    (шапка, кнопка подписки, форма комментария с CSRF-токеном,
+    ещё не записанные комментарии зрителя из очереди).
+    """
+    parts = [
+        name,
+        last_changed.isoformat(),
+        str(request.user.pk),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        str(request.session.get(PENDING_SESSION_KEY, '')),
+    ]
+    return quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+
+
+def conditional_page(last_changed_func):
+    """
+    Условный GET для представления. last_changed_func получает
+    аргументы представления и возвращает времена изменения всего,
+    что выводит страница, или None, если объекта нет. По самому
+    позднему из них считаются ETag и Last-Modified, и при совпадении
+    с запросом клиент получает 304 без выборки постов и шаблонов.
+    """
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            changes = last_changed_func(*args, **kwargs)
+            changes = [change for change in changes or () if change]
+            if not changes:
+                return view(request, *args, **kwargs)
+            last_changed = max(changes)
+            etag = get_etag(request, view.__name__, last_changed)
+            last_modified = int(last_changed.timestamp())
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            # Браузер проверяет страницу при каждом показе
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return inner
+    return decorator
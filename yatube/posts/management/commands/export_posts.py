@@ -0,0 +1,110 @@
+import datetime
+import gzip
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from posts.models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+# Разделы файла в порядке зависимостей: (тип, выборка, {ключ: поле})
+SECTIONS = (
+    ('user', User.objects.all(), {
+        'username': 'username',
+        'first_name': 'first_name',
+        'last_name': 'last_name',
+        'email': 'email',
+        'date_joined': 'date_joined',
+    }),
+    ('group', Group.objects.all(), {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    }),
+    ('post', Post.objects.all(), {
+        'id': 'pk',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    ('comment', Comment.objects.all(), {
+        'id': 'pk',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    ('follow', Follow.objects.all(), {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+)
+
+
+class RecordEncoder(DjangoJSONEncoder):
+    """Даты с микросекундами: DjangoJSONEncoder обрезает их до миллисекунд"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_ndjson(path, mode):
+    """Файл NDJSON, со сжатием gzip для имён на .gz"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает пользователей, группы, посты, комментарии и подписки '
+        'в NDJSON: одна запись на строку, база читается порциями и '
+        'целиком в память не загружается. Пароли и файлы картинок '
+        'не выгружаются, картинки переносятся вместе с MEDIA_ROOT'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл NDJSON, для .gz — сжатый')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько записей читается из базы за раз',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = 0
+        with open_ndjson(options['output'], 'w') as output:
+            for kind, queryset, fields in SECTIONS:
+                count = self.export(
+                    output, kind, queryset, fields, options['chunk_size']
+                )
+                self.stdout.write('{}: {}'.format(kind, count))
+                total += count
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            'Записей: {}, за {:.1f} с ({:.0f} в секунду)'.format(
+                total, elapsed, total / elapsed if elapsed else 0
+            )
+        )
+
+    def export(self, output, kind, queryset, fields, chunk_size):
+        rows = queryset.order_by('pk').values_list(*fields.values())
+        count = 0
+        for row in rows.iterator(chunk_size=chunk_size):
+            record = dict(zip(fields, row), type=kind)
+            output.write(json.dumps(
+                record, cls=RecordEncoder, ensure_ascii=False
+            ) + '\n')
+            count += 1
+        return count
@@ -0,0 +1,230 @@
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+
+from posts.cache import invalidate_feed
+from posts.models import Comment, Follow, Group, Post
+from posts.timeline import fill_timelines
+
+from .export_posts import SECTIONS, open_ndjson
+
+
+User = get_user_model()
+
+KINDS = [kind for kind, queryset, fields in SECTIONS]
+
+
+@contextmanager
+def keep_dates(*fields):
+    """bulk_create сохраняет даты из файла, а не текущее время"""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now_add in saved:
+            field.auto_now_add = auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает NDJSON из export_posts порциями через bulk_create. '
+        'После каждой порции сохраняется контрольная точка, и прерванная '
+        'загрузка продолжается с неё. Посты и комментарии получают id '
+        'из файла со сдвигом на максимальный id в базе, поэтому повторная '
+        'загрузка порции ничего не дублирует'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Файл NDJSON, для .gz — сжатый')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Сколько строк загружается одной транзакцией',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки, по умолчанию <input>.checkpoint',
+        )
+
+    def handle(self, *args, **options):
+        path = options['input']
+        self.verbosity = options['verbosity']
+        checkpoint = options['checkpoint'] or path + '.checkpoint'
+        self.state = self.load_checkpoint(checkpoint)
+        if self.state['line']:
+            self.stdout.write('Продолжение со строки {}'.format(
+                self.state['line'] + 1
+            ))
+        self.users = {}
+        self.groups = {}
+        self.counts = defaultdict(int)
+        started = time.perf_counter()
+        with open_ndjson(path, 'r') as lines:
+            chunk = []
+            for number, line in enumerate(lines, 1):
+                if number <= self.state['line'] or not line.strip():
+                    continue
+                chunk.append(json.loads(line))
+                if len(chunk) >= options['chunk_size']:
+                    self.import_chunk(chunk, number, checkpoint, started)
+                    chunk = []
+            if chunk:
+                self.import_chunk(chunk, number, checkpoint, started)
+        self.reset_sequences()
+        self.rebuild_derived()
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.perf_counter() - started
+        total = sum(self.counts.values())
+        for kind in KINDS:
+            self.stdout.write('{}: {}'.format(kind, self.counts[kind]))
+        self.stdout.write(
+            'Записей: {}, за {:.1f} с ({:.0f} в секунду)'.format(
+                total, elapsed, total / elapsed if elapsed else 0
+            )
+        )
+
+    def load_checkpoint(self, checkpoint):
+        """
+        Прочитанная строка и сдвиги id из контрольной точки.
+        Сдвиги выбираются при первом запуске и не меняются при продолжении.
+        """
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                return json.load(file)
+        return {
+            'line': 0,
+            'post_offset': Post.objects.aggregate(
+                last=Max('pk')
+            )['last'] or 0,
+            'comment_offset': Comment.objects.aggregate(
+                last=Max('pk')
+            )['last'] or 0,
+        }
+
+    def save_checkpoint(self, checkpoint):
+        temporary = checkpoint + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(self.state, file)
+        os.replace(temporary, checkpoint)
+
+    def import_chunk(self, records, line, checkpoint, started):
+        by_kind = defaultdict(list)
+        for record in records:
+            if record.get('type') not in KINDS:
+                raise CommandError(
+                    'Неизвестный тип записи в порции до строки {}: {}'.format(
+                        line, record.get('type')
+                    )
+                )
+            by_kind[record['type']].append(record)
+        with transaction.atomic(), keep_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            for kind in KINDS:
+                if by_kind[kind]:
+                    getattr(self, 'import_' + kind)(by_kind[kind])
+                    self.counts[kind] += len(by_kind[kind])
+        self.state['line'] = line
+        self.save_checkpoint(checkpoint)
+        if self.verbosity >= 2:
+            elapsed = time.perf_counter() - started
+            self.stdout.write('Строк: {} ({:.0f} записей в секунду)'.format(
+                line, sum(self.counts.values()) / elapsed if elapsed else 0
+            ))
+
+    def resolve(self, cache, model, field, keys):
+        """Дополняет словарь {ключ: id} недостающими ключами из базы"""
+        missing = {key for key in keys if key and key not in cache}
+        if missing:
+            cache.update(model.objects.filter(
+                **{field + '__in': missing}
+            ).values_list(field, 'pk'))
+        return cache
+
+    def import_user(self, records):
+        User.objects.bulk_create((User(
+            username=record['username'],
+            first_name=record['first_name'],
+            last_name=record['last_name'],
+            email=record['email'],
+            date_joined=parse_datetime(record['date_joined']),
+            password=make_password(None),
+        ) for record in records), ignore_conflicts=True)
+
+    def import_group(self, records):
+        Group.objects.bulk_create((Group(
+            slug=record['slug'],
+            title=record['title'],
+            description=record['description'],
+        ) for record in records), ignore_conflicts=True)
+
+    def import_post(self, records):
+        users = self.resolve(self.users, User, 'username',
+                             [record['author'] for record in records])
+        groups = self.resolve(self.groups, Group, 'slug',
+                              [record['group'] for record in records])
+        Post.objects.bulk_create((Post(
+            id=record['id'] + self.state['post_offset'],
+            author_id=users[record['author']],
+            group_id=groups.get(record['group']),
+            text=record['text'],
+            pub_date=parse_datetime(record['pub_date']),
+            image=record['image'] or '',
+        ) for record in records), ignore_conflicts=True)
+
+    def import_comment(self, records):
+        users = self.resolve(self.users, User, 'username',
+                             [record['author'] for record in records])
+        Comment.objects.bulk_create((Comment(
+            id=record['id'] + self.state['comment_offset'],
+            post_id=(record['post'] + self.state['post_offset']
+                     if record['post'] is not None else None),
+            author_id=users[record['author']],
+            text=record['text'],
+            created=parse_datetime(record['created']),
+        ) for record in records), ignore_conflicts=True)
+
+    def import_follow(self, records):
+        users = self.resolve(
+            self.users, User, 'username',
+            [record[key] for record in records for key in ('user', 'author')]
+        )
+        Follow.objects.bulk_create((Follow(
+            user_id=users[record['user']],
+            author_id=users[record['author']],
+        ) for record in records), ignore_conflicts=True)
+
+    def reset_sequences(self):
+        """Счётчики id после вставки явных id (нужно для PostgreSQL)"""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comment]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def rebuild_derived(self):
+        """
+        bulk_create не вызывает сигналы: счётчики, ленты подписок,
+        поисковый индекс и кеш ленты обновляются после загрузки.
+        """
+        call_command('recount_counters', stdout=self.stdout)
+        self.stdout.write('Лент подписок: {}'.format(fill_timelines()))
+        call_command('rebuild_search_index', stdout=self.stdout)
+        invalidate_feed()
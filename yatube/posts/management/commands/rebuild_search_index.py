@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.search import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит поисковый индекс постов и комментариев, например '
+        'после массовой загрузки данных без сигналов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Сколько постов индексируется одним запросом',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = get_backend().rebuild(options['batch_size'])
+        self.stdout.write('Постов в поисковом индексе: {}, за {:.1f} с'.format(
+            total, time.perf_counter() - started
+        ))
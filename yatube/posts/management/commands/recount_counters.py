@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.counters import compute_comments_counts, compute_user_counters
+from posts.models import Post, UserCounters
+
+
+User = get_user_model()
+
+USER_FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев, подписчиков '
+        'и подписок и сообщает о расхождениях'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только найти расхождения, ничего не исправляя',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пакета чтения и записи',
+        )
+
+    def handle(self, *args, **options):
+        check = options['check']
+        batch_size = options['batch_size']
+        users_drift = self.recount_users(check, batch_size)
+        posts_drift = self.recount_posts(check, batch_size)
+        self.stdout.write(
+            'Расхождений в счётчиках пользователей: {}, '
+            'в числе комментариев постов: {}'.format(users_drift, posts_drift)
+        )
+        if check and (users_drift or posts_drift):
+            raise CommandError('Счётчики расходятся с данными')
+
+    def recount_users(self, check, batch_size):
+        """Сверяет счётчики пользователей, возвращает число расхождений"""
+        expected = compute_user_counters()
+        drift = 0
+        to_create = []
+        to_update = []
+        users = User.objects.select_related('counters').only(
+            'pk', *('counters__' + field for field in USER_FIELDS)
+        )
+        for user in users.iterator(chunk_size=batch_size):
+            counters, created = self.diff_user(
+                user, expected.get(user.pk, (0, 0, 0))
+            )
+            if counters is None:
+                continue
+            drift += 1
+            if check:
+                continue
+            (to_create if created else to_update).append(counters)
+            if len(to_create) + len(to_update) >= batch_size:
+                self.save_users(to_create, to_update, batch_size)
+                to_create, to_update = [], []
+        if not check:
+            self.save_users(to_create, to_update, batch_size)
+        return drift
+
+    def diff_user(self, user, values):
+        """
+        Исправленные счётчики пользователя и признак, что их нужно создать.
+        Если счётчики верны, возвращает (None, False).
+        """
+        try:
+            counters = user.counters
+        except UserCounters.DoesNotExist:
+            if not any(values):
+                return None, False
+            return UserCounters(
+                user_id=user.pk, **dict(zip(USER_FIELDS, values))
+            ), True
+        if values == tuple(getattr(counters, f) for f in USER_FIELDS):
+            return None, False
+        for field, value in zip(USER_FIELDS, values):
+            setattr(counters, field, value)
+        counters.updated = timezone.now()
+        return counters, False
+
+    def save_users(self, to_create, to_update, batch_size):
+        UserCounters.objects.bulk_create(to_create, batch_size=batch_size)
+        UserCounters.objects.bulk_update(
+            to_update, USER_FIELDS + ('updated',), batch_size=batch_size
+        )
+
+    def recount_posts(self, check, batch_size):
+        """Сверяет число комментариев постов, возвращает число расхождений"""
+        expected = compute_comments_counts()
+        drift = 0
+        to_update = []
+        posts = Post.objects.order_by().only('pk', 'comments_count')
+        for post in posts.iterator(chunk_size=batch_size):
+            value = expected.get(post.pk, 0)
+            if post.comments_count == value:
+                continue
+            drift += 1
+            if not check:
+                post.comments_count = value
+                post.updated = timezone.now()
+                to_update.append(post)
+            if len(to_update) >= batch_size:
+                Post.objects.bulk_update(
+                    to_update, ['comments_count', 'updated']
+                )
+                to_update = []
+        Post.objects.bulk_update(to_update, ['comments_count', 'updated'])
+        return drift
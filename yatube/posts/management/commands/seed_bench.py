@@ -0,0 +1,169 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from posts.cache import invalidate_feed
+from posts.models import Comment, Follow, Group, Post
+from posts.timeline import fill_timelines
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу случайными пользователями, группами, постами, '
+        'комментариями и подписками для нагрузочных замеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='Число подписок каждого пользователя',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Зерно генератора: одинаковое зерно даёт одинаковые данные',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Сколько объектов создаётся в памяти за раз',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='Префикс имён пользователей и адресов групп',
+        )
+
+    def handle(self, *args, **options):
+        # Авторы постов и комментариев выбираются из созданных
+        # пользователей, комментарии — к созданным постам
+        for name in ('users', 'posts', 'chunk_size'):
+            if options[name] < 1:
+                raise CommandError('--{} должно быть не меньше 1'.format(
+                    name.replace('_', '-')
+                ))
+        for name in ('groups', 'comments', 'follows'):
+            if options[name] < 0:
+                raise CommandError(
+                    '--{} не может быть отрицательным'.format(name)
+                )
+        self.rnd = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        prefix = options['prefix']
+        with transaction.atomic():
+            user_ids = self.timed('Пользователи', self.create_users,
+                                  prefix, options['users'])
+            group_ids = self.timed('Группы', self.create_groups,
+                                   prefix, options['groups'])
+            post_ids = self.timed('Посты', self.create_posts,
+                                  user_ids, group_ids, options['posts'])
+            self.timed('Комментарии', self.create_comments,
+                       user_ids, post_ids, options['comments'])
+            self.timed('Подписки', self.create_follows,
+                       user_ids, options['follows'])
+            self.timed('Ленты подписок', fill_timelines)
+        self.timed('Счётчики', call_command, 'recount_counters',
+                   stdout=self.stdout)
+        self.timed('Поисковый индекс', call_command, 'rebuild_search_index',
+                   stdout=self.stdout)
+        invalidate_feed()
+
+    def timed(self, title, func, *args, **kwargs):
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        total = len(result) if isinstance(result, list) else result
+        self.stdout.write('{}: {}за {:.1f} с'.format(
+            title,
+            '' if total is None else '{} '.format(total),
+            time.perf_counter() - started,
+        ))
+        return result
+
+    def chunks(self, total):
+        for start in range(0, total, self.chunk_size):
+            yield range(start, min(start + self.chunk_size, total))
+
+    def new_ids(self, model, last_id):
+        return list(
+            model.objects.filter(pk__gt=last_id or 0).values_list(
+                'pk', flat=True
+            )
+        )
+
+    def create_users(self, prefix, total):
+        last_id = User.objects.aggregate(last=Max('pk'))['last']
+        start = User.objects.filter(username__startswith=prefix).count()
+        for chunk in self.chunks(total):
+            User.objects.bulk_create(
+                User(username='{}{}'.format(prefix, start + i),
+                     first_name='Имя{}'.format(start + i),
+                     last_name='Фамилия{}'.format(start + i))
+                for i in chunk
+            )
+        return self.new_ids(User, last_id)
+
+    def create_groups(self, prefix, total):
+        last_id = Group.objects.aggregate(last=Max('pk'))['last']
+        start = Group.objects.filter(slug__startswith=prefix).count()
+        Group.objects.bulk_create(
+            Group(title='Группа {}'.format(start + i),
+                  slug='{}-{}'.format(prefix, start + i),
+                  description='Описание группы {}'.format(start + i))
+            for i in range(total)
+        )
+        return self.new_ids(Group, last_id)
+
+    def create_posts(self, user_ids, group_ids, total):
+        last_id = Post.objects.aggregate(last=Max('pk'))['last']
+        group_ids = group_ids + [None]
+        for chunk in self.chunks(total):
+            Post.objects.bulk_create(
+                Post(text='Пост {} '.format(i) * self.rnd.randint(1, 20),
+                     author_id=self.rnd.choice(user_ids),
+                     group_id=self.rnd.choice(group_ids))
+                for i in chunk
+            )
+        return self.new_ids(Post, last_id)
+
+    def create_comments(self, user_ids, post_ids, total):
+        for chunk in self.chunks(total):
+            Comment.objects.bulk_create(
+                Comment(text='Комментарий {}'.format(i),
+                        post_id=self.rnd.choice(post_ids),
+                        author_id=self.rnd.choice(user_ids))
+                for i in chunk
+            )
+        return total
+
+    def create_follows(self, user_ids, per_user):
+        per_user = min(per_user, len(user_ids) - 1)
+        follows = []
+        total = 0
+        for user_id in user_ids:
+            authors = [author_id
+                       for author_id in self.rnd.sample(user_ids, per_user + 1)
+                       if author_id != user_id]
+            follows.extend(Follow(user_id=user_id, author_id=author_id)
+                           for author_id in authors[:per_user])
+            if len(follows) >= self.chunk_size:
+                Follow.objects.bulk_create(follows, ignore_conflicts=True)
+                total += len(follows)
+                follows = []
+        Follow.objects.bulk_create(follows, ignore_conflicts=True)
+        return total + len(follows)
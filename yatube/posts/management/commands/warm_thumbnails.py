@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import run_in_worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры картинок всех постов из THUMBNAIL_PREGENERATE, '
+        'например после смены размеров в шаблонах или очистки кеша'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Число потоков, которые создают миниатюры',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Сколько картинок отдаётся пулу за раз',
+        )
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        started = time.perf_counter()
+        total = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            chunk = []
+            for image in images.iterator():
+                chunk.append(image)
+                if len(chunk) >= options['chunk_size']:
+                    failed += list(pool.map(run_in_worker, chunk)).count(False)
+                    total += len(chunk)
+                    chunk = []
+            failed += list(pool.map(run_in_worker, chunk)).count(False)
+            total += len(chunk)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            'Картинок: {}, с ошибками: {}, за {:.1f} с ({:.1f} в секунду)'
+            .format(total, failed, elapsed, total / elapsed if elapsed else 0)
+        )
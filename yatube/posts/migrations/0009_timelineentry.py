@@ -0,0 +1,55 @@
+# Generated by Django 2.2.28 on 2026-10-18 02:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    """Раскладывает уже опубликованные посты по лентам подписчиков"""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    for follow in Follow.objects.iterator():
+        posts = Post.objects.filter(
+            author_id=follow.author_id
+        ).values_list('pk', flat=True)
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                           author_id=follow.author_id)
+             for post_id in posts.iterator()),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0008_auto_20220216_0813'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты подписок',
+                'verbose_name_plural': 'Записи ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    """Считает счётчики по уже существующим постам, комментариям и подпискам"""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserCounters = apps.get_model('posts', 'UserCounters')
+
+    def count_by(queryset, field):
+        return dict(
+            queryset.order_by().values_list(field).annotate(
+                total=models.Count('pk')
+            )
+        )
+
+    comments = count_by(Comment.objects.all(), 'post')
+    for post_id, total in comments.items():
+        if post_id is not None:
+            Post.objects.filter(pk=post_id).update(comments_count=total)
+    posts = count_by(Post.objects.all(), 'author')
+    followers = count_by(Follow.objects.all(), 'author')
+    following = count_by(Follow.objects.all(), 'user')
+    UserCounters.objects.bulk_create(
+        (UserCounters(
+            user_id=user_id,
+            posts_count=posts.get(user_id, 0),
+            followers_count=followers.get(user_id, 0),
+            following_count=following.get(user_id, 0),
+        ) for user_id in set(posts) | set(followers) | set(following)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0009_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Число постов')),
+                ('followers_count', models.PositiveIntegerField(default=0, verbose_name='Число подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Число подписок')),
+            ],
+            options={
+                'verbose_name': 'Счётчики пользователя',
+                'verbose_name_plural': 'Счётчики пользователей',
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Число комментариев'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_search_table(apps, schema_editor):
+    """
+    Поисковый индекс FTS5 для posts.search.SQLiteFTSBackend.
+    В других базах таблица не создаётся, там используется другой индекс.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        'text, comments, tokenize="unicode61 remove_diacritics 2")'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, comments) '
+        'SELECT p.id, p.text, COALESCE(('
+        '  SELECT group_concat(c.text, \' \') FROM posts_comment c '
+        '  WHERE c.post_id = p.id'
+        '), \'\') FROM posts_post p'
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
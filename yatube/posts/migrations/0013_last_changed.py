@@ -0,0 +1,36 @@
+# Generated by Django 2.2.28 on 2026-10-18 03:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddField(
+            model_name='usercounters',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-updated'], name='post_author_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-updated'], name='post_group_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+
+def create_search_rows(apps, schema_editor):
+    """
+    Отдельные записи FTS5 для поста и каждого комментария к нему
+    вместо одной записи с текстами всех комментариев поста.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        'text, comments, post_id UNINDEXED, '
+        'tokenize="unicode61 remove_diacritics 2")'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, comments, post_id) '
+        "SELECT 2 * id, text, '', id FROM posts_post"
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, comments, post_id) '
+        "SELECT 2 * id + 1, '', text, post_id FROM posts_comment"
+    )
+
+
+def create_post_rows(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute('DROP TABLE posts_search')
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_search USING fts5('
+        'text, comments, tokenize="unicode61 remove_diacritics 2")'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_search (rowid, text, comments) '
+        'SELECT p.id, p.text, COALESCE(('
+        '  SELECT group_concat(c.text, \' \') FROM posts_comment c '
+        '  WHERE c.post_id = p.id'
+        '), \'\') FROM posts_post p'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_last_changed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_rows, create_post_rows),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
 
@@ -23,11 +23,41 @@ class Group(models.Model):
         verbose_name='Описание группы',
         help_text='Укажите описание группы.'
     )
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
 
     def __str__(self):
         return str(self.title)
 
 
+class PostQuerySet(models.QuerySet):
+    """Выборки постов"""
+
+    # Поля поста, автора и группы, которые выводит карточка поста в ленте
+    FEED_FIELDS = (
+        'text',
+        'pub_date',
+        'image',
+        'author',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'group',
+        'group__title',
+        'group__slug',
+        'comments_count',
+    )
+
+    def for_feed(self):
+        """
+        Посты для ленты: автор и группа в том же запросе
+        и только выводимые поля.
+        """
+        return self.select_related('author', 'group').only(*self.FEED_FIELDS)
+
+
 class Post(models.Model):
     """Модель управления постами"""
     text = models.TextField(
@@ -57,16 +87,83 @@ class Post(models.Model):
         verbose_name='Картинка',
         help_text='Добавьте картинку'
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Число комментариев',
+        default=0,
+        editable=False,
+    )
+    # Меняется вместе со всем, что выводит страница поста и его карточка:
+    # пост, комментарии, группа, имена автора и комментаторов
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         """Вывод поста по текстовой строке"""
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get('image')
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        return instance
+
+    @property
+    def image_changed(self):
+        """Картинка отличается от загруженной из базы"""
+        loaded = getattr(self, '_loaded_image', None)
+        return str(loaded or '') != (self.image.name or '')
+
+    @property
+    def previous_group_id(self):
+        """Группа поста, загруженная из базы; у нового поста — None"""
+        return getattr(self, '_loaded_group_id', None)
+
+    @property
+    def group_changed(self):
+        return self.previous_group_id != self.group_id
+
+    def save(self, *args, **kwargs):
+        # post_save обновляет счётчики в той же транзакции
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+        self._loaded_image = self.image.name
+        self._loaded_group_id = self.group_id
+
     class Meta:
         ordering = ['-pub_date']
         default_related_name = 'posts'
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Индексы повторяют порядок лент (pub_date, id): главной,
+        # группы и профиля, поэтому лента читается без сортировки
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            # Последнее изменение постов автора и группы для Last-Modified
+            models.Index(
+                fields=['author', '-updated'],
+                name='post_author_updated_idx'
+            ),
+            models.Index(
+                fields=['group', '-updated'],
+                name='post_group_updated_idx'
+            ),
+        ]
 
 
 class Comment(models.Model):
@@ -94,6 +191,19 @@ class Comment(models.Model):
         auto_now_add=True
     )
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     """Модель управления подписками"""
@@ -115,3 +225,94 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class UserCounters(models.Model):
+    """
+    Счётчики пользователя: постов, подписчиков и подписок.
+    Обновляются сигналами при создании и удалении постов и подписок,
+    пересчитываются командой recount_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Число постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Число подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Число подписок',
+        default=0,
+    )
+    # Меняется вместе со счётчиками и именем пользователя
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    """
+    Запись ленты подписок пользователя.
+    Создаётся при публикации поста для каждого подписчика автора
+    (fan-out on write), поэтому лента читается без подзапроса по подпискам.
+    Дата публикации поста копируется в запись, чтобы лента листалась
+    по индексу (user, -pub_date, -post) без сортировки постов.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации поста',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx'
+            ),
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            ),
+        ]
@@ -0,0 +1,242 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Q
+from django.utils.module_loading import import_string
+
+from core.paginator import ElidedPaginator
+
+from .models import Comment, Post
+from .utils import NUMBER_OF_POSTS
+
+
+WORD_RE = re.compile(r'\w+')
+
+
+def get_terms(query):
+    """Слова поискового запроса в нижнем регистре"""
+    return WORD_RE.findall(query.lower())
+
+
+class BaseSearchBackend:
+    """
+    Поисковый индекс постов.
+    Пост находится по своему тексту и по текстам комментариев к нему.
+    """
+
+    def index_post(self, post_id):
+        """Добавляет пост в индекс или обновляет его запись"""
+        raise NotImplementedError
+
+    def remove_post(self, post_id):
+        """Удаляет пост из индекса"""
+        raise NotImplementedError
+
+    def index_comment(self, comment_id):
+        """Добавляет комментарий в индекс или обновляет его запись"""
+        raise NotImplementedError
+
+    def index_new_comments(self, post_ids, since):
+        """Индексирует комментарии к постам post_ids не старше since"""
+        raise NotImplementedError
+
+    def remove_comment(self, comment_id):
+        """Удаляет комментарий из индекса"""
+        raise NotImplementedError
+
+    def search(self, query, limit):
+        """id найденных постов, самые подходящие первыми"""
+        raise NotImplementedError
+
+    def rebuild(self, batch_size):
+        """Заново строит индекс, возвращает число постов в нём"""
+        raise NotImplementedError
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Индекс в виртуальной таблице SQLite FTS5 (миграция 0014).
+    Пост и каждый комментарий к нему — отдельные записи с id поста
+    в post_id, поэтому новый комментарий добавляет одну запись и не
+    перечитывает остальные. rowid поста — 2 * id, комментария —
+    2 * id + 1. Посты упорядочены по лучшей bm25 своих записей,
+    текст поста весит больше текста комментариев.
+    """
+
+    table = 'posts_search'
+    text_weight = 2.0
+    comments_weight = 1.0
+
+    def insert_posts_sql(self, where):
+        return (
+            'INSERT OR REPLACE INTO {table} (rowid, text, comments, post_id) '
+            "SELECT 2 * p.id, p.text, '', p.id FROM {post} p "
+            'WHERE {where}'.format(
+                table=self.table, post=Post._meta.db_table, where=where
+            )
+        )
+
+    def insert_comments_sql(self, where):
+        return (
+            'INSERT OR REPLACE INTO {table} (rowid, text, comments, post_id) '
+            "SELECT 2 * c.id + 1, '', c.text, c.post_id FROM {comment} c "
+            'WHERE {where}'.format(
+                table=self.table, comment=Comment._meta.db_table, where=where
+            )
+        )
+
+    def execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def index_post(self, post_id):
+        self.execute(self.insert_posts_sql('p.id = %s'), [post_id])
+
+    def remove_post(self, post_id):
+        # Записи комментариев удаляет сигнал удаления каждого комментария
+        self.execute(
+            'DELETE FROM {} WHERE rowid = %s'.format(self.table),
+            [2 * post_id]
+        )
+
+    def index_comment(self, comment_id):
+        self.execute(self.insert_comments_sql('c.id = %s'), [comment_id])
+
+    def index_new_comments(self, post_ids, since):
+        post_ids = list(post_ids)
+        self.execute(
+            self.insert_comments_sql(
+                'c.post_id IN ({}) AND c.created >= %s'.format(
+                    ', '.join(['%s'] * len(post_ids))
+                )
+            ),
+            post_ids + [since]
+        )
+
+    def remove_comment(self, comment_id):
+        self.execute(
+            'DELETE FROM {} WHERE rowid = %s'.format(self.table),
+            [2 * comment_id + 1]
+        )
+
+    def match_expression(self, term):
+        """
+        Запрос FTS5 для слова пользователя: слово в кавычках, чтобы
+        операторы FTS5 в запросе не разбирались, с поиском по началу.
+        """
+        return '"{}"*'.format(term)
+
+    def search(self, query, limit):
+        """
+        Записи с любым из слов собираются по посту; пост подходит, если
+        каждое слово есть в его тексте или в одном из комментариев.
+        """
+        terms = [self.match_expression(term) for term in get_terms(query)]
+        if not terms:
+            return []
+        every_term = ' AND '.join(
+            ['post_id IN (SELECT post_id FROM {table} '
+             'WHERE {table} MATCH %s)'] * len(terms)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                ('SELECT post_id FROM {table} '
+                 'WHERE {table} MATCH %s AND rank MATCH %s '
+                 'GROUP BY post_id HAVING ' + every_term + ' '
+                 'ORDER BY MIN(rank) LIMIT %s').format(table=self.table),
+                [
+                    ' OR '.join(terms),
+                    'bm25({}, {})'.format(
+                        self.text_weight, self.comments_weight
+                    ),
+                    *terms,
+                    limit,
+                ]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_batches(self, model, sql, batch_size):
+        """Выполняет sql по диапазонам id модели, возвращает число записей"""
+        last_id = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        return sum(
+            self.execute(sql, [start, start + batch_size])
+            for start in range(0, last_id, batch_size)
+        )
+
+    def rebuild(self, batch_size):
+        self.execute('DELETE FROM {}'.format(self.table))
+        total = self.index_batches(
+            Post, self.insert_posts_sql('p.id > %s AND p.id <= %s'),
+            batch_size
+        )
+        self.index_batches(
+            Comment, self.insert_comments_sql('c.id > %s AND c.id <= %s'),
+            batch_size
+        )
+        return total
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Поиск без индекса через LIKE для баз без FTS5.
+    Все слова запроса должны встретиться в посте или его комментариях,
+    новые посты первыми.
+    """
+
+    def index_post(self, post_id):
+        pass
+
+    def remove_post(self, post_id):
+        pass
+
+    def index_comment(self, comment_id):
+        pass
+
+    def index_new_comments(self, post_ids, since):
+        pass
+
+    def remove_comment(self, comment_id):
+        pass
+
+    def search(self, query, limit):
+        terms = get_terms(query)
+        if not terms:
+            return []
+        condition = Q()
+        for term in terms:
+            commented = Comment.objects.filter(
+                text__icontains=term
+            ).values('post')
+            condition &= Q(text__icontains=term) | Q(pk__in=commented)
+        return list(
+            Post.objects.filter(condition).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pk', flat=True)[:limit]
+        )
+
+    def rebuild(self, batch_size):
+        return Post.objects.count()
+
+
+def get_backend():
+    """Поисковый индекс из настройки SEARCH_BACKEND"""
+    return import_string(settings.SEARCH_BACKEND)()
+
+
+def search_page(request, query):
+    """
+    Страница результатов поиска.
+    Индекс отдаёт не больше SEARCH_MAX_RESULTS id, посты загружаются
+    только для текущей страницы.
+    """
+    post_ids = get_backend().search(query, settings.SEARCH_MAX_RESULTS)
+    page_obj = ElidedPaginator(post_ids, NUMBER_OF_POSTS).get_page(
+        request.GET.get('page')
+    )
+    posts = Post.objects.for_feed().in_bulk(page_obj.object_list)
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    return page_obj
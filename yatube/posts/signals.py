@@ -0,0 +1,183 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import counters, last_changed, search, thumbnails, timeline
+from .cache import invalidate_feed
+from .models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_feed_on_change(sender, **kwargs):
+    """
+    Пост или группа изменились — лента устарела. Комментарии версию
+    ленты не сбрасывают: число комментариев на закешированной странице
+    обновляет get_cached_page.
+    """
+    invalidate_feed()
+
+
+# Поля пользователя, которые выводятся на страницах постов
+PROFILE_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def get_profile(instance, fields=PROFILE_FIELDS):
+    """Загруженные (не отложенные) поля профиля пользователя"""
+    return {
+        name: instance.__dict__[name]
+        for name in fields if name in instance.__dict__
+    }
+
+
+@receiver(post_init, sender=User)
+def remember_profile(sender, instance, **kwargs):
+    """Запоминает имя пользователя, как Post.from_db — картинку и группу"""
+    instance._loaded_profile = get_profile(instance)
+
+
+def is_profile_change(instance, created, update_fields):
+    """
+    Изменение пользователя, видимое на страницах: новый пользователь
+    постов ещё не имеет, а вход, смена пароля или почты не меняют
+    имя автора.
+    """
+    if created:
+        return False
+    fields = PROFILE_FIELDS
+    if update_fields is not None:
+        fields = [name for name in fields if name in update_fields]
+    loaded = getattr(instance, '_loaded_profile', {})
+    return any(
+        name not in loaded or loaded[name] != value
+        for name, value in get_profile(instance, fields).items()
+    )
+
+
+@receiver(post_save, sender=User)
+def on_profile_change(sender, instance, created, update_fields=None,
+                      **kwargs):
+    """Имя автора выводится в ленте и на страницах его постов"""
+    if is_profile_change(instance, created, update_fields):
+        invalidate_feed()
+        last_changed.touch_user(instance.pk)
+    instance._loaded_profile = get_profile(instance)
+
+
+@receiver(post_save, sender=Post)
+def touch_post_groups(sender, instance, **kwargs):
+    """Пост добавлен в группу или перенесён в другую"""
+    if instance.group_changed:
+        last_changed.touch_groups(
+            [instance.group_id, instance.previous_group_id]
+        )
+
+
+@receiver(post_delete, sender=Post)
+def touch_deleted_post_group(sender, instance, **kwargs):
+    last_changed.touch_groups([instance.group_id])
+
+
+@receiver(post_save, sender=Group)
+def touch_group_posts(sender, instance, created, **kwargs):
+    if not created:
+        last_changed.touch_group_posts(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def touch_commented_post(sender, instance, created, **kwargs):
+    """
+    Изменённый комментарий; новые и удалённые комментарии меняют
+    дату поста вместе с числом комментариев.
+    """
+    if not created and instance.post_id is not None:
+        last_changed.touch_post(instance.post_id)
+
+
+# Счётчики обновляются раньше лент подписок: порог fan-out
+# сравнивается с уже обновлённым числом подписчиков
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.author_id, 'posts_count')
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'posts_count')
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created and instance.post_id is not None:
+        counters.change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id is not None:
+        counters.change_comments_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(instance.author_id, 'followers_count')
+        counters.increment(instance.user_id, 'following_count')
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'followers_count')
+    counters.decrement(instance.user_id, 'following_count')
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    """Новый пост попадает в ленты подписчиков автора"""
+    if created:
+        timeline.fan_out_post(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, **kwargs):
+    """Миниатюры новой картинки создаются в фоне, а не при первом показе"""
+    if instance.image and instance.image_changed:
+        thumbnails.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.get_backend().index_post(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    """Пост находится и по тексту комментариев"""
+    search.get_backend().index_comment(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.get_backend().remove_comment(instance.pk)
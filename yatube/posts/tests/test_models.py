@@ -1,6 +1,14 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-from ..models import Group, Post, User, Comment
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from ..models import Group, Post, User, Comment, Follow, UserCounters
 
 
 class PostModelTest(TestCase):
@@ -117,3 +125,211 @@ class PostModelTest(TestCase):
                     expected,
                     'verbose_name модели Group не совпадает с ожидаемыми.'
                 )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.user = User.objects.create_user(username='auth_1')
+        cls.posts = [Post.objects.create(
+            author=cls.author,
+            text='Тестовая запись',
+        ) for i in range(3)]
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении записей"""
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        Comment.objects.create(post=post, author=self.user, text='Текст')
+        Follow.objects.create(user=self.user, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        author_counters = UserCounters.objects.get(user=self.author)
+        self.assertEqual(author_counters.posts_count, 3)
+        self.assertEqual(author_counters.followers_count, 1)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.user).following_count, 1
+        )
+        post.comments.first().delete()
+        Follow.objects.filter(user=self.user).delete()
+        self.posts[1].delete()
+        post.refresh_from_db()
+        author_counters.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(author_counters.posts_count, 2)
+        self.assertEqual(author_counters.followers_count, 0)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.user).following_count, 0
+        )
+
+    def test_recount_counters_fixes_drift(self):
+        """recount_counters находит и исправляет расхождения"""
+        Comment.objects.create(
+            post=self.posts[0], author=self.user, text='Текст'
+        )
+        UserCounters.objects.filter(user=self.author).update(posts_count=10)
+        Post.objects.filter(pk=self.posts[0].pk).update(comments_count=0)
+        with self.assertRaises(CommandError):
+            call_command('recount_counters', check=True, stdout=StringIO())
+        out = StringIO()
+        call_command('recount_counters', stdout=out)
+        self.assertIn('пользователей: 1, в числе комментариев постов: 1',
+                      out.getvalue())
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts_count, 3
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.posts[0].pk).comments_count, 1
+        )
+        call_command('recount_counters', check=True, stdout=StringIO())
+
+
+class SeedBenchTest(TestCase):
+    def test_seed_bench_creates_consistent_data(self):
+        """seed_bench создаёт данные с согласованными счётчиками и лентами"""
+        call_command(
+            'seed_bench', users=10, groups=2, posts=50, comments=30,
+            follows=3, stdout=StringIO()
+        )
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 30)
+        self.assertEqual(Follow.objects.count(), 30)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            follow.user.timeline.filter(author=follow.author).count(),
+            follow.author.posts.count()
+        )
+        call_command('recount_counters', check=True, stdout=StringIO())
+
+    def test_seed_bench_rejects_empty_counts(self):
+        """Без пользователей и постов seed_bench не запускается"""
+        for option in ('users', 'posts', 'chunk_size'):
+            with self.subTest(option=option):
+                with self.assertRaises(CommandError):
+                    call_command('seed_bench', stdout=StringIO(),
+                                 **{option: 0})
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+@mock.patch('posts.thumbnails.transaction.on_commit', lambda func: func())
+@mock.patch('posts.thumbnails.get_thumbnail')
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    def test_thumbnails_created_on_image_change(self, get_thumbnail):
+        """Миниатюры создаются для новой картинки, а не при каждом save"""
+        post = Post.objects.create(
+            author=self.author, text='Текст', image='posts/small.gif'
+        )
+        get_thumbnail.assert_called_once_with(
+            'posts/small.gif', '960x339', crop='center', upscale=True
+        )
+        post = Post.objects.get(pk=post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(get_thumbnail.call_count, 1)
+        post.image = 'posts/big.gif'
+        post.save()
+        get_thumbnail.assert_called_with(
+            'posts/big.gif', '960x339', crop='center', upscale=True
+        )
+        Post.objects.create(author=self.author, text='Без картинки')
+        self.assertEqual(get_thumbnail.call_count, 2)
+
+    def test_warm_thumbnails(self, get_thumbnail):
+        """warm_thumbnails обходит все картинки и считает ошибки"""
+        for name in ('posts/1.gif', 'posts/2.gif', 'posts/1.gif', ''):
+            Post.objects.filter(pk=Post.objects.create(
+                author=self.author, text='Текст'
+            ).pk).update(image=name)
+
+        def broken_second_image(name, *args, **kwargs):
+            if name == 'posts/2.gif':
+                raise OSError(name)
+
+        get_thumbnail.side_effect = broken_second_image
+        out = StringIO()
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            call_command(
+                'warm_thumbnails', workers=2, chunk_size=1, stdout=out
+            )
+        self.assertEqual(get_thumbnail.call_count, 2)
+        self.assertIn('Картинок: 2, с ошибками: 1', out.getvalue())
+
+
+class ExportImportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.user = User.objects.create_user(username='auth_1')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [Post.objects.create(
+            author=cls.author,
+            text='Тестовая запись {}'.format(i),
+            group=cls.group if i % 2 else None,
+        ) for i in range(3)]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'posts.ndjson.gz')
+
+    def test_export_import_round_trip(self):
+        """Загрузка выгрузки копирует посты с датами и комментариями"""
+        out = StringIO()
+        call_command('export_posts', self.path, chunk_size=2, stdout=out)
+        self.assertIn('Записей: 8', out.getvalue())
+        call_command('import_posts', self.path, stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Comment.objects.count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(User.objects.count(), 2)
+        for post in self.posts:
+            copy = Post.objects.exclude(pk=post.pk).get(text=post.text)
+            self.assertEqual(copy.pub_date, post.pub_date)
+            self.assertEqual(copy.author, self.author)
+            self.assertEqual(copy.group, post.group)
+        copy = Post.objects.exclude(pk=self.posts[0].pk).get(
+            text=self.posts[0].text
+        )
+        self.assertEqual(copy.comments_count, 1)
+        self.assertEqual(self.user.timeline.count(), 6)
+        call_command('recount_counters', check=True, stdout=StringIO())
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_import_resumes_from_checkpoint(self):
+        """Прерванная загрузка продолжается без повторов"""
+        call_command('export_posts', self.path, stdout=StringIO())
+        with mock.patch(
+            'posts.management.commands.import_posts.Command.import_comment',
+            side_effect=RuntimeError,
+        ):
+            with self.assertRaises(RuntimeError):
+                call_command(
+                    'import_posts', self.path, chunk_size=1, stdout=StringIO()
+                )
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertTrue(os.path.exists(self.path + '.checkpoint'))
+        out = StringIO()
+        call_command('import_posts', self.path, chunk_size=1, stdout=out)
+        self.assertIn('Продолжение со строки 7', out.getvalue())
+        self.assertEqual(Post.objects.count(), 6)
+        self.assertEqual(Comment.objects.count(), 2)
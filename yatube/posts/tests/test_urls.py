@@ -24,6 +24,7 @@ class PostsURLTests(TestCase):
             '/group/test-slug/': 'posts/group_list.html',
             '/profile/auth_1/': 'posts/profile.html',
             '/posts/' + str(cls.post.pk) + '/': 'posts/post_detail.html',
+            '/search/': 'posts/search.html',
         }
         cls.private_templates_urls = {
             '/posts/' + str(cls.post.pk) + '/edit/': 'posts/post_create.html',
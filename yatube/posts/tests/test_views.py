@@ -1,14 +1,23 @@
 import shutil
 import tempfile
 
+from io import StringIO
+from unittest import mock
+
 from django.conf import settings
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from http import HTTPStatus
 
-from ..models import Post, Group, User, Follow
+from .. import timeline
+from ..cache import get_card_key, get_feed_version
+from ..comment_queue import CommentQueue, write_comments
+from ..models import Post, Group, User, Follow, TimelineEntry, Comment
 from ..forms import PostForm
 
 
@@ -57,6 +66,7 @@ class PostsPagesTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=False)
 
     def setUp(self) -> None:
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(PostsPagesTests.usr_author)
 
@@ -165,14 +175,57 @@ class PostsPagesTests(TestCase):
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         cache_check = response.content
-        post = Post.objects.get(pk=1)
-        post.delete()
+        # update() не шлёт сигналов, страница отдаётся из кеша
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигнала')
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertEqual(response.content, cache_check)
         cache.clear()
         response = self.authorized_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, cache_check)
 
+    def test_cache_index_page_invalidated_on_change(self):
+        """Изменение поста или группы сбрасывает кеш главной страницы"""
+        cache.clear()
+        response = self.authorized_client.get(reverse('posts:index'))
+        cache_check = response.content
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигнала')
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название группы'
+        group.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotEqual(response.content, cache_check)
+        self.assertContains(response, 'Без сигнала')
+        Post.objects.get(pk=self.post.pk).delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_comment_keeps_feed_version(self):
+        """
+        Комментарий не сбрасывает кеш ленты, но число комментариев
+        на закешированной странице обновляется
+        """
+        cache.clear()
+        self.authorized_client.get(reverse('posts:index'))
+        version = get_feed_version()
+        Comment.objects.create(
+            post=self.post, author=self.usr_author, text='Комментарий'
+        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(get_feed_version(), version)
+        self.assertEqual(response.context['page_obj'][0].comments_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_cache_index_page_depends_on_page(self):
+        """Кеш главной страницы различает номер страницы"""
+        cache.clear()
+        for i in range(10):
+            Post.objects.create(author=self.usr_author, text='Запись')
+        first = self.authorized_client.get(reverse('posts:index'))
+        second = self.authorized_client.get(reverse('posts:index') + '?page=2')
+        self.assertEqual(len(first.context['page_obj']), 10)
+        self.assertEqual(len(second.context['page_obj']), 1)
+        self.assertNotEqual(first.content, second.content)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -191,6 +244,7 @@ class PaginatorViewsTest(TestCase):
         ) for i in range(13)]
 
     def setUp(self) -> None:
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.usr_author)
 
@@ -243,6 +297,52 @@ class PaginatorViewsTest(TestCase):
                 self.assertIn('page_obj', response.context)
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_cursor_pages_cover_all_records(self):
+        """Курсорная пагинация проходит ленту вперёд и назад без пропусков"""
+        templates_pages_names = [
+            reverse('posts:index'),
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': 'test-slug'}
+            ),
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.usr_author.username}
+            )
+        ]
+        expected = [post.pk for post in reversed(self.posts)]
+        for reverse_name in templates_pages_names:
+            with self.subTest(reverse_name=reverse_name):
+                response = self.authorized_client.get(reverse_name)
+                first_page = response.context['page_obj']
+                response = self.authorized_client.get(
+                    reverse_name + '?cursor=' + first_page.next_cursor
+                )
+                second_page = response.context['page_obj']
+                self.assertIsNone(second_page.number)
+                self.assertIsNone(second_page.next_cursor)
+                self.assertEqual(
+                    [post.pk for post in first_page]
+                    + [post.pk for post in second_page],
+                    expected
+                )
+                response = self.authorized_client.get(
+                    reverse_name + '?cursor=' + second_page.previous_cursor
+                )
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    expected[:10]
+                )
+
+    def test_invalid_cursor_shows_first_page(self):
+        """Испорченный курсор отдаёт первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:index') + '?cursor=broken'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), 10)
+
     def test_group_list_show_correct_context(self):
         """Список постов отфильтрованых по группе"""
         response = self.authorized_client.get(
@@ -287,6 +387,7 @@ class FollowViewsTest(TestCase):
         ) for i in range(13)]
 
     def setUp(self) -> None:
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
         self.authorized_client_2 = Client()
@@ -348,3 +449,707 @@ class FollowViewsTest(TestCase):
         )
         post_count = len(response.context['page_obj'])
         self.assertEqual(post_count, 0)
+
+    def test_follow_timeline_fan_out_on_write(self):
+        """Посты автора раскладываются по ленте подписчика и убираются"""
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.usr_author.username}
+            )
+        )
+        entries = TimelineEntry.objects.filter(user=self.user)
+        self.assertEqual(entries.count(), len(self.posts))
+        new_post = Post.objects.create(
+            author=self.usr_author,
+            text='Новая запись',
+        )
+        self.assertTrue(entries.filter(post=new_post).exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        self.authorized_client.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.usr_author.username}
+            )
+        )
+        self.assertEqual(entries.count(), 0)
+
+    def test_follow_timeline_paginated_by_entries(self):
+        """Лента листается по записям в порядке даты публикации постов"""
+        Follow.objects.create(user=self.user, author=self.usr_author)
+        entries = TimelineEntry.objects.filter(user=self.user)
+        self.assertEqual(
+            set(entries.values_list('post', 'pub_date')),
+            set(Post.objects.filter(
+                author=self.usr_author
+            ).values_list('pk', 'pub_date'))
+        )
+        expected = list(Post.objects.filter(
+            author=self.usr_author
+        ).order_by('-pub_date', '-pk'))
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), expected[:10])
+        response = self.authorized_client.get(
+            reverse('posts:follow_index'), {'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), expected[10:])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_follow_timeline_fan_out_on_read(self):
+        """Посты автора с большим числом подписчиков читаются напрямую"""
+        Follow.objects.create(user=self.user, author=self.usr_author)
+        new_post = Post.objects.create(
+            author=self.usr_author,
+            text='Новая запись',
+        )
+        self.assertFalse(TimelineEntry.objects.exists())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], new_post)
+        self.assertEqual(
+            response.context['page_obj'].paginator.count,
+            len(self.posts) + 1
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2, TIMELINE_BACKFILL_WORKERS=0)
+    def test_backfill_deferred_after_unfollow(self):
+        """
+        Посты автора, у которого стало меньше подписчиков, чем порог,
+        раскладываются по лентам после фиксации, а не в запросе отписки
+        """
+        follow = Follow.objects.create(
+            user=self.user_2, author=self.usr_author
+        )
+        Follow.objects.create(user=self.user, author=self.usr_author)
+        entries = TimelineEntry.objects.filter(user=self.user)
+        self.assertFalse(entries.exists())
+        callbacks = []
+        with mock.patch(
+            'posts.timeline.transaction.on_commit', callbacks.append
+        ):
+            follow.delete()
+            follow = Follow.objects.create(
+                user=self.user_2, author=self.usr_author
+            )
+            follow.delete()
+        self.assertFalse(entries.exists())
+        self.assertEqual(len(callbacks), 2)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(entries.count(), len(self.posts))
+
+    @override_settings(TIMELINE_BACKFILL_WORKERS=1)
+    def test_backfill_scheduled_once(self):
+        """Пока раскладка автора ждёт в очереди, вторая не добавляется"""
+        executor = mock.Mock()
+        with mock.patch('posts.timeline.get_executor', return_value=executor):
+            timeline.submit_backfill(self.usr_author.pk)
+            timeline.submit_backfill(self.usr_author.pk)
+            self.assertEqual(executor.submit.call_count, 1)
+            with mock.patch('posts.timeline.backfill_followers'), \
+                    mock.patch('posts.timeline.connection'):
+                timeline.run_backfill(self.usr_author.pk)
+            timeline.submit_backfill(self.usr_author.pk)
+        self.assertEqual(executor.submit.call_count, 2)
+        timeline._scheduled.clear()
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.usr_author = User.objects.create_user(username='auth')
+        cls.user = User.objects.create_user(username='auth_1')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [Post.objects.create(
+            author=cls.usr_author,
+            text='Тестовая запись',
+            group=cls.group
+        ) for i in range(13)]
+        for post in cls.posts:
+            Comment.objects.create(
+                post=post,
+                author=cls.user,
+                text='Тестовый комментарий',
+            )
+        Follow.objects.create(user=cls.user, author=cls.usr_author)
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_pages_query_budget(self):
+        """
+        Число запросов ленты не зависит от числа постов на странице:
+        сессия, пользователь, группа или автор, подсчёт и сами посты,
+        у группы и профиля ещё время последнего изменения.
+        """
+        pages_queries = {
+            reverse('posts:index'): 4,
+            reverse(
+                'posts:group_list',
+                kwargs={'slug': 'test-slug'}
+            ): 6,
+            reverse(
+                'posts:profile',
+                kwargs={'username': self.usr_author.username}
+            ): 6,
+            reverse('posts:follow_index'): 5,
+        }
+        for reverse_name, queries in pages_queries.items():
+            with self.subTest(reverse_name=reverse_name):
+                with self.assertNumQueries(queries):
+                    response = self.authorized_client.get(reverse_name)
+                self.assertEqual(len(response.context['page_obj']), 10)
+
+    def test_feed_posts_have_comments_count(self):
+        """Посты ленты содержат число комментариев"""
+        response = self.authorized_client.get(reverse('posts:index'))
+        for post in response.context['page_obj']:
+            self.assertEqual(post.comments_count, 1)
+
+
+class SearchViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.usr_author = User.objects.create_user(username='auth')
+        cls.post_about_cats = Post.objects.create(
+            author=cls.usr_author,
+            text='Кошки любят спать на солнце',
+        )
+        cls.post_about_dogs = Post.objects.create(
+            author=cls.usr_author,
+            text='Собаки любят гулять',
+        )
+        Comment.objects.create(
+            post=cls.post_about_dogs,
+            author=cls.usr_author,
+            text='А кошки гулять не любят',
+        )
+        Post.objects.bulk_create(Post(
+            author=cls.usr_author,
+            text='Пост про погоду {}'.format(i),
+        ) for i in range(13))
+        call_command('rebuild_search_index', stdout=StringIO())
+
+    def setUp(self) -> None:
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response
+
+    def test_search_by_post_and_comment_text(self):
+        """Пост находится по своему тексту и по комментариям"""
+        response = self.search('кошки')
+        self.assertEqual(
+            list(response.context['page_obj']),
+            [self.post_about_cats, self.post_about_dogs]
+        )
+        self.assertEqual(
+            list(self.search('Соба').context['page_obj']),
+            [self.post_about_dogs]
+        )
+        self.assertEqual(len(self.search('слон').context['page_obj']), 0)
+
+    def test_words_from_post_and_comment(self):
+        """Слова запроса могут быть в разных записях одного поста"""
+        self.assertEqual(
+            list(self.search('собаки кошки').context['page_obj']),
+            [self.post_about_dogs]
+        )
+
+    def test_comment_indexed_alone(self):
+        """Комментарий меняет свою запись индекса, не перечитывая пост"""
+        with CaptureQueriesContext(connection) as captured:
+            comment = Comment.objects.create(
+                post=self.post_about_cats,
+                author=self.usr_author,
+                text='Жирафы',
+            )
+        indexing = [
+            query['sql'] for query in captured.captured_queries
+            if 'posts_search' in query['sql']
+        ]
+        self.assertEqual(len(indexing), 1)
+        self.assertNotIn('group_concat', indexing[0])
+        self.assertEqual(
+            list(self.search('жирафы').context['page_obj']),
+            [self.post_about_cats]
+        )
+        comment.delete()
+        self.assertEqual(len(self.search('жирафы').context['page_obj']), 0)
+
+    @override_settings(SEARCH_BACKEND='posts.search.SimpleSearchBackend')
+    def test_simple_search_backend(self):
+        """Поиск без индекса находит те же посты, новые первыми"""
+        self.assertEqual(
+            list(self.search('любят').context['page_obj']),
+            [self.post_about_dogs, self.post_about_cats]
+        )
+
+    def test_search_query_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не приводят к ошибке"""
+        for query in ('"кошки', 'кошки AND', 'NEAR(', '*', 'кошки OR -'):
+            with self.subTest(query=query):
+                self.search(query)
+
+    def test_search_index_follows_changes(self):
+        post = Post.objects.get(pk=self.post_about_cats.pk)
+        post.text = 'Попугаи любят летать'
+        post.save()
+        self.assertEqual(
+            list(self.search('попугаи').context['page_obj']), [post]
+        )
+        post.delete()
+        self.assertEqual(len(self.search('попугаи').context['page_obj']), 0)
+
+    def test_search_pagination(self):
+        """Результаты разбиты на страницы, ссылки сохраняют запрос"""
+        response = self.search('погоду')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertContains(
+            response, '?q=%D0%BF%D0%BE%D0%B3%D0%BE%D0%B4%D1%83&amp;page=2'
+        )
+        response = self.search('погоду', page=2)
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertContains(
+            response, '?q=%D0%BF%D0%BE%D0%B3%D0%BE%D0%B4%D1%83&amp;page=1'
+        )
+
+    def test_rebuild_search_index(self):
+        """rebuild_search_index индексирует посты, созданные без сигналов"""
+        Post.objects.bulk_create([
+            Post(author=self.usr_author, text='Еноты любят воду')
+        ])
+        self.assertEqual(len(self.search('еноты').context['page_obj']), 0)
+        out = StringIO()
+        call_command('rebuild_search_index', batch_size=5, stdout=out)
+        self.assertIn('Постов в поисковом индексе: 16', out.getvalue())
+        self.assertEqual(len(self.search('еноты').context['page_obj']), 1)
+
+
+class PostCardsCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.usr_author = User.objects.create_user(
+            username='auth', first_name='Лев', last_name='Толстой'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.usr_author,
+            text='Тестовая запись',
+            group=cls.group,
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+        self.url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+
+    def test_page_assembled_from_cached_cards(self):
+        """Страница собирается из закешированных карточек"""
+        self.guest_client.get(self.url)
+        post = Post.objects.for_feed().get(pk=self.post.pk)
+        key = get_card_key(post, 'group')
+        self.assertIn('Тестовая запись', cache.get(key))
+        cache.set(key, '<article>Из кеша</article>')
+        response = self.guest_client.get(self.url)
+        self.assertContains(response, 'Из кеша')
+
+    def test_card_version_follows_related_changes(self):
+        """
+        Новые текст поста, имя автора или название группы сразу видны
+        на странице, даже если изменены без сигналов.
+        """
+        self.assertContains(self.guest_client.get(self.url), 'Лев Толстой')
+        changes = (
+            (User.objects.filter(pk=self.usr_author.pk),
+             {'first_name': 'Алексей'}, 'Алексей Толстой'),
+            (Group.objects.filter(pk=self.group.pk),
+             {'slug': 'new-slug'}, '/group/new-slug/'),
+            (Post.objects.filter(pk=self.post.pk),
+             {'text': 'Новый текст'}, 'Новый текст'),
+        )
+        for queryset, values, expected in changes:
+            with self.subTest(expected=expected):
+                queryset.update(**values)
+                group = Group.objects.get(pk=self.group.pk)
+                response = self.guest_client.get(
+                    reverse('posts:group_list', kwargs={'slug': group.slug})
+                )
+                self.assertContains(response, expected)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.usr_author = User.objects.create_user(username='auth')
+        cls.user = User.objects.create_user(username='auth_1')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.usr_author,
+            text='Тестовая запись',
+            group=cls.group,
+        )
+        cls.urls = (
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def assertNotModified(self, client, url, response):
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': response['ETag']},
+            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']},
+        ):
+            with self.subTest(url=url, headers=headers):
+                with self.assertNumQueries(1):
+                    not_modified = client.get(url, **headers)
+                self.assertEqual(
+                    not_modified.status_code, HTTPStatus.NOT_MODIFIED
+                )
+
+    def test_unchanged_page_not_modified(self):
+        """Неизменившаяся страница отдаётся как 304 без отрисовки"""
+        for url in self.urls:
+            response = self.guest_client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertNotModified(self.guest_client, url, response)
+
+    def test_etag_depends_on_viewer(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                guest = self.guest_client.get(url)
+                user = self.authorized_client.get(url)
+                self.assertNotEqual(guest['ETag'], user['ETag'])
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=guest['ETag']
+                )
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_changes_give_new_etag(self):
+        """Новый комментарий, правка поста, группы или автора меняют ETag"""
+        changes = (
+            lambda: Comment.objects.create(
+                post=self.post, author=self.user, text='Комментарий'
+            ),
+            lambda: Post.objects.get(pk=self.post.pk).save(),
+            lambda: Group.objects.get(pk=self.group.pk).save(),
+            lambda: self.rename_author('Лев'),
+            lambda: Comment.objects.first().delete(),
+        )
+        for change in changes:
+            etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+            change()
+            for url, etag in zip(self.urls, etags):
+                with self.subTest(url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def rename_author(self, first_name):
+        author = User.objects.get(pk=self.usr_author.pk)
+        author.first_name = first_name
+        author.save()
+
+    def test_user_save_without_profile_change_keeps_etag(self):
+        """Вход, смена пароля или почты не меняют страницы автора"""
+        author = User.objects.get(pk=self.usr_author.pk)
+
+        def change_password():
+            author.set_password('новый пароль')
+            author.save()
+
+        def change_email():
+            author.email = 'auth@example.com'
+            author.save(update_fields=['email', 'first_name'])
+
+        changes = (
+            lambda: author.save(),
+            change_password,
+            change_email,
+            lambda: User.objects.get(pk=self.usr_author.pk).save(),
+        )
+        for change in changes:
+            etags = [self.guest_client.get(url)['ETag'] for url in self.urls]
+            change()
+            for url, etag in zip(self.urls, etags):
+                with self.subTest(url=url):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(
+                        response.status_code, HTTPStatus.NOT_MODIFIED
+                    )
+
+    def test_membership_changes_give_new_etag(self):
+        """Новый или удалённый пост и подписка меняют ETag профиля и группы"""
+        profile_url, group_url = self.urls[1:]
+        changes = (
+            (lambda: Post.objects.create(
+                author=self.usr_author, text='Новый', group=self.group
+            ), (profile_url, group_url)),
+            (lambda: Follow.objects.create(
+                user=self.user, author=self.usr_author
+            ), (profile_url,)),
+            (lambda: Post.objects.get(text='Новый').delete(),
+             (profile_url, group_url)),
+        )
+        for change, urls in changes:
+            etags = [self.authorized_client.get(url)['ETag'] for url in urls]
+            change()
+            for url, etag in zip(urls, etags):
+                with self.subTest(url=url):
+                    response = self.authorized_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(COMMENT_QUEUE_ENABLED=True)
+class CommentQueueTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.usr_author = User.objects.create_user(username='auth')
+        cls.user = User.objects.create_user(username='auth_1')
+        cls.post = Post.objects.create(
+            author=cls.usr_author,
+            text='Тестовая запись',
+        )
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.comment_url = reverse(
+            'posts:add_comment', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.author_client = Client()
+        self.author_client.force_login(self.usr_author)
+        # Очередь без фонового потока: тест записывает её сам
+        self.queue = CommentQueue(
+            max_size=2, batch_size=10, flush_interval=0, put_timeout=0
+        )
+        patcher = mock.patch(
+            'posts.comment_queue.get_queue', return_value=self.queue
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def comment_texts(self, client):
+        response = client.get(self.detail_url)
+        return [comment.text for comment in response.context['comments']]
+
+    def test_comments_written_in_batch(self):
+        """Пачка из очереди записывается со счётчиком и поисковым индексом"""
+        for text in ('Первый', 'Второй'):
+            self.authorized_client.post(self.comment_url, {'text': text})
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self.queue.flush(), 2)
+        self.assertEqual(
+            list(Comment.objects.values_list('text', 'author')),
+            [('Первый', self.user.pk), ('Второй', self.user.pk)]
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.comments_count, 2)
+        self.assertGreater(post.updated, self.post.updated)
+        response = self.authorized_client.get(
+            reverse('posts:search'), {'q': 'второй'}
+        )
+        self.assertEqual(list(response.context['page_obj']), [post])
+
+    def test_read_your_writes(self):
+        """Автор видит свой комментарий до записи, остальные — после"""
+        self.authorized_client.post(self.comment_url, {'text': 'Ждёт'})
+        self.assertEqual(self.comment_texts(self.authorized_client), ['Ждёт'])
+        self.assertEqual(self.comment_texts(self.author_client), [])
+        self.queue.flush()
+        self.assertEqual(self.comment_texts(self.authorized_client), ['Ждёт'])
+        self.assertEqual(self.comment_texts(self.author_client), ['Ждёт'])
+        self.assertEqual(
+            self.authorized_client.session['pending_comments'], []
+        )
+
+    def test_written_during_put_not_shown_twice(self):
+        """Комментарий, записанный потоком очереди сразу, виден один раз"""
+        def put_and_write(comment):
+            write_comments([comment])
+
+        with mock.patch.object(self.queue, 'put', put_and_write):
+            self.authorized_client.post(self.comment_url, {'text': 'Сразу'})
+        cache.clear()
+        texts = self.comment_texts(self.authorized_client)
+        self.assertEqual(texts.count('Сразу'), 1)
+        self.assertEqual(
+            self.authorized_client.session['pending_comments'], []
+        )
+
+    def test_pending_after_newest_comments(self):
+        """
+        На длинном посте свой комментарий виден после самых новых,
+        а после записи — один раз и без следа в сессии
+        """
+        Comment.objects.bulk_create(Comment(
+            post=self.post, author=self.usr_author, text='Старый {}'.format(i)
+        ) for i in range(25))
+        cache.clear()
+        self.authorized_client.post(self.comment_url, {'text': 'Мой'})
+        self.assertNotIn('Мой', self.comment_texts(self.authorized_client))
+        response = self.authorized_client.get(
+            self.detail_url, {'comments': self.get_next_cursor()}
+        )
+        texts = [comment.text for comment in response.context['comments']]
+        self.assertEqual(texts[-1], 'Мой')
+        data = self.authorized_client.get(reverse(
+            'posts:post_comments', kwargs={'post_id': self.post.pk}
+        ), {'cursor': self.get_next_cursor()}).json()
+        self.assertIn('<p>Мой</p>', data['html'])
+        self.queue.flush()
+        cache.clear()
+        self.assertNotIn('Мой', self.comment_texts(self.authorized_client))
+        self.assertEqual(
+            self.authorized_client.session['pending_comments'], []
+        )
+        response = self.authorized_client.get(
+            self.detail_url, {'comments': self.get_next_cursor()}
+        )
+        texts = [comment.text for comment in response.context['comments']]
+        self.assertEqual(texts.count('Мой'), 1)
+
+    def get_next_cursor(self):
+        return self.authorized_client.get(
+            self.detail_url
+        ).context['comments_next']
+
+    def test_pending_comment_changes_etag(self):
+        etag = self.authorized_client.get(self.detail_url)['ETag']
+        self.authorized_client.post(self.comment_url, {'text': 'Ждёт'})
+        response = self.authorized_client.get(
+            self.detail_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_full_queue_rejects_comment(self):
+        """Полная очередь отвечает 503 с Retry-After"""
+        for text in ('Первый', 'Второй'):
+            self.authorized_client.post(self.comment_url, {'text': text})
+        response = self.authorized_client.post(
+            self.comment_url, {'text': 'Третий'}
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.SERVICE_UNAVAILABLE
+        )
+        self.assertIn('Retry-After', response)
+        self.queue.flush()
+        self.assertEqual(Comment.objects.count(), 2)
+
+    @override_settings(COMMENT_QUEUE_ENABLED=False)
+    def test_disabled_queue_writes_at_once(self):
+        self.authorized_client.post(self.comment_url, {'text': 'Сразу'})
+        self.assertTrue(Comment.objects.filter(text='Сразу').exists())
+        self.assertEqual(self.queue.queue.qsize(), 0)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.usr_author = User.objects.create_user(username='auth')
+        cls.users = [
+            User.objects.create_user(username='user_{}'.format(i))
+            for i in range(5)
+        ]
+        cls.post = Post.objects.create(
+            author=cls.usr_author,
+            text='Тестовая запись',
+        )
+        cls.comments = [Comment.objects.create(
+            post=cls.post,
+            author=cls.users[i % 5],
+            text='Комментарий {}'.format(i),
+        ) for i in range(25)]
+        cls.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': cls.post.pk}
+        )
+        cls.fragment_url = reverse(
+            'posts:post_comments', kwargs={'post_id': cls.post.pk}
+        )
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_first_page_and_fragment(self):
+        """Страница поста выводит первые комментарии, остальные подгружаются"""
+        response = self.guest_client.get(self.detail_url)
+        self.assertEqual(response.context['comments'], self.comments[:20])
+        cursor = response.context['comments_next']
+        self.assertIsNotNone(cursor)
+        with self.assertNumQueries(2):
+            response = self.guest_client.get(
+                self.fragment_url, {'cursor': cursor}
+            )
+        data = response.json()
+        self.assertIsNone(data['next'])
+        for comment in self.comments:
+            with self.subTest(comment=comment.text):
+                self.assertEqual(
+                    '<p>{}</p>'.format(comment.text) in data['html'],
+                    comment in self.comments[20:]
+                )
+        response = self.guest_client.get(self.detail_url, {'comments': cursor})
+        self.assertEqual(response.context['comments'], self.comments[20:])
+        self.assertIsNone(response.context['comments_next'])
+
+    def test_first_page_cached(self):
+        """Первая страница комментариев берётся из кеша до их изменения"""
+        self.guest_client.get(self.detail_url)
+        # Даты изменения для ETag и сам пост, без комментариев
+        with self.assertNumQueries(2):
+            self.guest_client.get(self.detail_url)
+        comment = Comment.objects.get(pk=self.comments[0].pk)
+        comment.text = 'Исправленный'
+        comment.save()
+        response = self.guest_client.get(self.detail_url)
+        self.assertEqual(response.context['comments'][0].text, 'Исправленный')
+
+    def test_fragment_errors(self):
+        response = self.guest_client.get(self.fragment_url, {'cursor': 'x'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
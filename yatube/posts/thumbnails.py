@@ -0,0 +1,73 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import get_thumbnail
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_geometries():
+    """Размеры и параметры миниатюр, которые выводят шаблоны"""
+    return settings.THUMBNAIL_PREGENERATE
+
+
+def pregenerate(image_name):
+    """
+    Создаёт все миниатюры картинки.
+    Уже созданные sorl находит в хранилище ключей и не пересчитывает.
+    """
+    for geometry, options in get_geometries():
+        get_thumbnail(image_name, geometry, **options)
+
+
+def safe_pregenerate(image_name):
+    """Как pregenerate, но ошибка только записывается в журнал"""
+    try:
+        pregenerate(image_name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image_name)
+        return False
+    return True
+
+
+def run_in_worker(image_name):
+    try:
+        return safe_pregenerate(image_name)
+    finally:
+        # Соединение с базой открывается в потоке пула для хранилища
+        # ключей sorl и само не закрывается
+        connection.close()
+
+
+def get_executor():
+    """Пул потоков процесса, создаётся при первой задаче"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def submit(image_name):
+    """
+    Отдаёт картинку пулу потоков.
+    При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу в этом потоке.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        return safe_pregenerate(image_name)
+    return get_executor().submit(run_in_worker, image_name)
+
+
+def schedule(image_name):
+    """Создаёт миниатюры после фиксации транзакции, в которой сохранён пост"""
+    transaction.on_commit(lambda: submit(image_name))
@@ -0,0 +1,228 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .counters import recount_user
+from .models import (
+    Follow, Post, PostQuerySet, TimelineEntry, UserCounters
+)
+from .utils import FEED_COUNT_LIMIT, paginate
+
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Порядок записей ленты совпадает с индексом timeline_user_pub_date_idx
+TIMELINE_ORDERING = ('-pub_date', '-post_id')
+
+_executor = None
+_executor_lock = threading.Lock()
+# Авторы, раскладка постов которых уже стоит в очереди пула
+_scheduled = set()
+
+
+def get_fanout_limit():
+    """Число подписчиков, начиная с которого посты не раздаются по лентам"""
+    return settings.TIMELINE_FANOUT_LIMIT
+
+
+def get_followers_count(author_id):
+    """Число подписчиков автора по счётчику"""
+    followers = UserCounters.objects.filter(
+        user_id=author_id
+    ).values_list('followers_count', flat=True).first()
+    if followers is None:
+        followers = recount_user(author_id).followers_count
+    return followers
+
+
+def is_fanout_author(author_id):
+    """Посты автора раскладываются по лентам подписчиков при публикации"""
+    return get_followers_count(author_id) < get_fanout_limit()
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты подписчиков автора"""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, author_id=post.author_id,
+                       pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту пользователя уже опубликованные посты автора"""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post_id, author_id=author_id,
+                       pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает посты автора по лентам всех подписчиков"""
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def run_backfill(author_id):
+    with _executor_lock:
+        _scheduled.discard(author_id)
+    try:
+        backfill_followers(author_id)
+    except Exception:
+        logger.exception('Не удалось разложить посты автора %s', author_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    """Пул потоков раскладки, создаётся при первой задаче"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.TIMELINE_BACKFILL_WORKERS,
+            thread_name_prefix='timeline',
+        )
+    return _executor
+
+
+def submit_backfill(author_id):
+    """
+    Отдаёт раскладку постов автора пулу потоков. Пока задача автора
+    ждёт в очереди, новые не добавляются: подписки и отписки на пороге
+    сливаются в одну раскладку, которая сама проверяет порог при запуске.
+    При TIMELINE_BACKFILL_WORKERS = 0 посты раскладываются сразу.
+    """
+    if not settings.TIMELINE_BACKFILL_WORKERS:
+        return backfill_followers(author_id)
+    with _executor_lock:
+        if author_id in _scheduled:
+            return None
+        _scheduled.add(author_id)
+        executor = get_executor()
+    return executor.submit(run_backfill, author_id)
+
+
+def prune(user_id, author_id):
+    """
+    Убирает из ленты пользователя посты автора.
+    Если у автора стало меньше подписчиков, чем порог, его посты
+    больше не читаются напрямую и раскладываются по лентам оставшихся —
+    после фиксации транзакции в пуле потоков, а не в запросе отписки.
+    """
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).delete()
+    if get_followers_count(author_id) == get_fanout_limit() - 1:
+        transaction.on_commit(lambda: submit_backfill(author_id))
+
+
+def get_read_authors(user):
+    """
+    Авторы с числом подписчиков не меньше порога, на которых подписан
+    пользователь: их посты в ленты не раскладываются
+    """
+    return list(
+        Follow.objects.filter(
+            user=user,
+            author__counters__followers_count__gte=get_fanout_limit(),
+        ).values_list('author', flat=True)
+    )
+
+
+def get_timeline(user, read_authors=None):
+    """
+    Посты ленты подписок пользователя.
+    Посты авторов с числом подписчиков не меньше порога в ленты
+    не раскладываются и читаются напрямую (fan-out on read).
+    """
+    if read_authors is None:
+        read_authors = get_read_authors(user)
+    if not read_authors:
+        return Post.objects.filter(timeline_entries__user=user)
+    entries = TimelineEntry.objects.filter(user=user).values('post')
+    return Post.objects.filter(
+        Q(pk__in=entries) | Q(author__in=read_authors)
+    )
+
+
+def get_timeline_entries(user):
+    """Записи ленты с полями постов для карточки в ленте"""
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).only(
+        'pub_date', 'post',
+        *('post__' + field for field in PostQuerySet.FEED_FIELDS)
+    )
+
+
+def get_timeline_page(request, user):
+    """
+    Страница ленты подписок.
+    Если все посты ленты разложены по записям, листаются записи
+    по индексу (user, -pub_date, -post), а посты с авторами и группами
+    загружаются в том же запросе. Ключ курсора у записей и постов
+    одинаковый: (pub_date, id поста).
+    """
+    read_authors = get_read_authors(user)
+    if read_authors:
+        return paginate(
+            request, get_timeline(user, read_authors).for_feed(),
+            count_limit=FEED_COUNT_LIMIT
+        )
+    page = paginate(
+        request, get_timeline_entries(user),
+        count_limit=FEED_COUNT_LIMIT, ordering=TIMELINE_ORDERING
+    )
+    page.object_list = [entry.post for entry in page.object_list]
+    return page
+
+
+def fill_timelines():
+    """
+    Раскладывает по лентам подписчиков посты, которых там ещё нет,
+    одним INSERT ... SELECT: сигналы при bulk_create не срабатывают,
+    а поштучная раскладка миллионов записей через ORM занимает часы.
+    Авторы с числом подписчиков не меньше порога пропускаются,
+    как и при обычной публикации. Возвращает число добавленных записей.
+    """
+    entry = TimelineEntry._meta.db_table
+    follow = Follow._meta.db_table
+    post = Post._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO {entry} (user_id, post_id, author_id, pub_date) '
+            'SELECT f.user_id, p.id, p.author_id, p.pub_date '
+            'FROM {follow} f JOIN {post} p ON p.author_id = f.author_id '
+            'WHERE f.author_id NOT IN ('
+            '  SELECT author_id FROM {follow} '
+            '  GROUP BY author_id HAVING COUNT(*) >= %s'
+            ') AND NOT EXISTS ('
+            '  SELECT 1 FROM {entry} t '
+            '  WHERE t.user_id = f.user_id AND t.post_id = p.id'
+            ')'.format(entry=entry, follow=follow, post=post),
+            [get_fanout_limit()]
+        )
+        return cursor.rowcount
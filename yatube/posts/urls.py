@@ -10,6 +10,7 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -26,6 +27,11 @@ urlpatterns = [
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
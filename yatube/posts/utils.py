@@ -0,0 +1,49 @@
+from core.paginator import CursorPaginator
+
+from .models import Comment
+
+
+NUMBER_OF_POSTS = 10
+COMMENTS_PER_PAGE = 20
+FEED_ORDERING = ('-pub_date', '-pk')
+# Ленты без счётчика постов считают не больше этого числа постов,
+# дальше по ним листают курсором
+FEED_COUNT_LIMIT = 10000
+
+
+def get_paginator(post_list, count_limit=None, count=None,
+                  ordering=FEED_ORDERING):
+    """Пагинатор ленты постов по ключу (pub_date, id)"""
+    return CursorPaginator(
+        post_list, NUMBER_OF_POSTS, ordering=ordering,
+        count_limit=count_limit, count=count
+    )
+
+
+def paginate(request, post_list, count_limit=None, count=None,
+             ordering=FEED_ORDERING):
+    """
+    Страница ленты постов.
+    ?cursor= листает по ключу (pub_date, id) без OFFSET и COUNT(*),
+    ?page= отдаёт номерную страницу.
+    """
+    paginator = get_paginator(
+        post_list, count_limit=count_limit, count=count, ordering=ordering
+    )
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return paginator.get_cursor_page(cursor)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def get_comment_paginator(post_id):
+    """
+    Пагинатор комментариев поста по ключу (created, id), старые первыми.
+    Страницы листаются только курсором, число комментариев не считается.
+    """
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    return CursorPaginator(
+        comments, COMMENTS_PER_PAGE, ordering=('created', 'pk')
+    )
@@ -1,37 +1,57 @@
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_safe
 
+from core.paginator import InvalidCursor
+
+from .comment_queue import QueueFull, get_pending, save_comment
 from .models import Post, Group, User, Follow
+from .cache import FEED_CACHE_TIMEOUT, get_cached_page, get_first_comments
+from .counters import get_user_counters
 from .forms import PostForm, CommentForm
+from .last_changed import (
+    conditional_page, group_last_changed, post_last_changed,
+    profile_last_changed
+)
+from .search import search_page
+from .timeline import get_timeline_page
+from .utils import FEED_COUNT_LIMIT, get_comment_paginator, paginate
+
 
+# Через сколько секунд повторить комментарий, если очередь заполнена
+COMMENT_RETRY_AFTER = 5
 
-NUMBER_OF_POSTS = 10
+COMMENT_ITEMS_TEMPLATE = 'posts/includes/comment_items.html'
 
 
 def index(request):
     """Функция главной страницы с выводом всех постов"""
 
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page_obj, feed_cache_key = get_cached_page(
+        request, 'index', post_list, count_limit=FEED_COUNT_LIMIT
+    )
     context = {
         'page_obj': page_obj,
+        'feed_cache_key': feed_cache_key,
+        'feed_cache_timeout': FEED_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
+@conditional_page(group_last_changed)
 def group_posts(request, slug):
     """Функция вывода всех постов группы"""
 
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.for_feed()
+    page_obj = paginate(request, post_list, count_limit=FEED_COUNT_LIMIT)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -39,17 +59,33 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+def search(request):
+    """Поиск постов по тексту поста и комментариев к нему"""
+
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': search_page(request, query) if query else None,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+@conditional_page(profile_last_changed)
 def profile(request, username):
     """Функция профиля пользователя с выводом всех его постов"""
 
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
-    user_posts = user.posts.all()
-    paginator = Paginator(user_posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    user = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    counters = get_user_counters(user)
+    user_posts = user.posts.for_feed()
+    page_obj = paginate(request, user_posts, count=counters.posts_count)
     context = {
         'author': user,
+        'counters': counters,
         'page_obj': page_obj,
     }
     if request.user.username == username:
@@ -60,6 +96,7 @@ def profile(request, username):
         ).filter(author=user) else False
         context = {
             'author': user,
+            'counters': counters,
             'page_obj': page_obj,
             'following': following,
         }
@@ -68,23 +105,71 @@ def profile(request, username):
         return render(request, template, context)
 
 
+@conditional_page(post_last_changed)
 def post_detail(request, post_id):
     """Функция просмотра отдельного поста"""
 
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), pk=post_id
+    )
+    cursor = request.GET.get('comments')
+    if cursor:
+        # Следующие комментарии без JavaScript
+        page = get_comment_paginator(post.pk).get_cursor_page(cursor)
+        comments, comments_next = list(page), page.next_cursor
+    else:
+        comments, comments_next = get_first_comments(post)
+    # Свои ещё не записанные комментарии — после самых новых
+    pending = get_pending(request, post.pk)
+    if comments_next is None:
+        comments = list(comments) + pending
     form = CommentForm()
-    posts_count = post.author.posts.all().count()
+    posts_count = get_user_counters(post.author).posts_count
     context = {
         'post': post,
         'posts_count': posts_count,
         'form': form,
         'comments': comments,
+        'comments_next': comments_next,
     }
     return render(request, template, context)
 
 
+@require_safe
+def post_comments(request, post_id):
+    """
+    Страница комментариев для подгрузки на странице поста:
+    {"html": разметка комментариев, "next": адрес следующей страницы}.
+    """
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    paginator = get_comment_paginator(post_id)
+    cursor = request.GET.get('cursor')
+    try:
+        page = (
+            paginator.cursor_page(cursor) if cursor
+            else paginator.first_page()
+        )
+    except InvalidCursor:
+        return JsonResponse({'detail': 'Неверный курсор'}, status=400)
+    comments = list(page)
+    pending = get_pending(request, post_id)
+    next_url = None
+    if page.next_cursor:
+        next_url = '{}?{}'.format(
+            reverse('posts:post_comments', args=[post_id]),
+            urlencode({'cursor': page.next_cursor})
+        )
+    else:
+        comments += pending
+    return JsonResponse({
+        'html': render_to_string(
+            COMMENT_ITEMS_TEMPLATE, {'comments': comments}, request
+        ),
+        'next': next_url,
+    })
+
+
 @login_required
 def post_edit(request, post_id):
     """
@@ -143,13 +228,18 @@ def post_create(request):
 def add_comment(request, post_id):
     """Функция создания комментария"""
 
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        try:
+            save_comment(request, comment)
+        except QueueFull:
+            response = render(request, 'core/503.html', status=503)
+            response['Retry-After'] = COMMENT_RETRY_AFTER
+            return response
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -157,15 +247,7 @@ def add_comment(request, post_id):
 def follow_index(request):
     """Функция избранных авторов"""
     template = 'posts/follow.html'
-    faivorite_authors = Follow.objects.filter(
-        user=request.user
-    ).all().values_list('author')
-    post_list = Post.objects.select_related(
-        'author'
-    ).all().filter(author_id__in=faivorite_authors)
-    paginator = Paginator(post_list, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = get_timeline_page(request, request.user)
     context = {
         'page_obj': page_obj,
     }
@@ -0,0 +1,48 @@
+"""
+Настройки кеша из переменных окружения.
+
+CACHE_TIER   locmem (по умолчанию) — кеш в памяти каждого процесса;
+             sqlite — общий для процессов кеш в файле SQLite;
+             tiered — кеш в памяти процесса перед общим файлом
+CACHE_PATH   файл общего кеша
+"""
+import os
+
+
+LOCMEM = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+}
+
+
+def shared_cache(env, base_dir, **options):
+    return {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': (
+            env.get('CACHE_PATH') or os.path.join(base_dir, 'cache.sqlite3')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000, **options},
+    }
+
+
+def get_caches(base_dir, env=os.environ):
+    """Значение CACHES для уровня CACHE_TIER"""
+    tier = env.get('CACHE_TIER') or 'locmem'
+    if tier == 'locmem':
+        return {'default': LOCMEM}
+    if tier == 'sqlite':
+        return {'default': shared_cache(env, base_dir, TIER='shared')}
+    if tier == 'tiered':
+        return {
+            'default': {
+                'BACKEND': 'core.cache.TieredCache',
+                'LOCATION': 'default',
+                'OPTIONS': {
+                    'L2': 'shared',
+                    'L1_TIMEOUT': 10,
+                    'L1_MAX_ENTRIES': 1000,
+                    'CHECK_INTERVAL': 1,
+                },
+            },
+            'shared': shared_cache(env, base_dir),
+        }
+    raise ValueError('CACHE_TIER: {} не поддерживается'.format(tier))
@@ -0,0 +1,102 @@
+"""
+Настройки базы данных из переменных окружения.
+
+DB_ENGINE        sqlite (по умолчанию) или postgresql
+DB_NAME          файл SQLite или имя базы PostgreSQL
+DB_USER, DB_PASSWORD, DB_HOST, DB_PORT — подключение к PostgreSQL
+DB_CONN_MAX_AGE  сколько секунд держать соединение открытым
+                 между запросами, 0 — закрывать после каждого
+DB_TIMEOUT       сколько секунд SQLite ждёт блокировку записи,
+                 PostgreSQL — подключения
+DB_POOLER        pgbouncer — соединения идут через PgBouncer
+                 в режиме пула транзакций
+DB_REPLICAS      реплики для чтения через запятую: файлы SQLite
+                 или хосты PostgreSQL (host или host:port)
+"""
+import os
+
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+
+
+def get_int(env, name, default):
+    return int(env.get(name) or default)
+
+
+def sqlite_database(env, base_dir):
+    return {
+        'ENGINE': ENGINES['sqlite'],
+        'NAME': env.get('DB_NAME') or os.path.join(base_dir, 'db.sqlite3'),
+        'OPTIONS': {'timeout': get_int(env, 'DB_TIMEOUT', 20)},
+    }
+
+
+def postgresql_database(env):
+    database = {
+        'ENGINE': ENGINES['postgresql'],
+        'NAME': env.get('DB_NAME') or 'yatube',
+        'USER': env.get('DB_USER') or 'postgres',
+        'PASSWORD': env.get('DB_PASSWORD', ''),
+        'HOST': env.get('DB_HOST') or 'localhost',
+        'PORT': env.get('DB_PORT') or '5432',
+        'OPTIONS': {'connect_timeout': get_int(env, 'DB_TIMEOUT', 10)},
+    }
+    if env.get('DB_POOLER') == 'pgbouncer':
+        # В пуле транзакций курсор не переживает транзакцию,
+        # а соединения держит сам PgBouncer
+        database['DISABLE_SERVER_SIDE_CURSORS'] = True
+    return database
+
+
+def replica_database(default, replica):
+    """Копия основной базы с другим файлом SQLite или хостом"""
+    database = dict(default, OPTIONS=dict(default['OPTIONS']))
+    if default['ENGINE'] == ENGINES['sqlite']:
+        database['NAME'] = replica
+    else:
+        host, _, port = replica.partition(':')
+        database['HOST'] = host
+        database['PORT'] = port or default['PORT']
+    # Тесты читают реплику из тестовой основной базы
+    database['TEST'] = {'MIRROR': 'default'}
+    return database
+
+
+def get_databases(base_dir, env=os.environ):
+    """Значение DATABASES: основная база default и реплики replica_N"""
+    engine = env.get('DB_ENGINE') or 'sqlite'
+    if engine not in ENGINES:
+        raise ValueError('DB_ENGINE: {} не поддерживается'.format(engine))
+    if engine == 'sqlite':
+        default = sqlite_database(env, base_dir)
+        conn_max_age = 60
+    else:
+        default = postgresql_database(env)
+        # Через PgBouncer соединение процесса дёшево, PgBouncer сам
+        # держит постоянные соединения с PostgreSQL
+        conn_max_age = 0 if env.get('DB_POOLER') == 'pgbouncer' else 600
+    default['CONN_MAX_AGE'] = get_int(env, 'DB_CONN_MAX_AGE', conn_max_age)
+    databases = {'default': default}
+    replicas = [
+        replica.strip()
+        for replica in (env.get('DB_REPLICAS') or '').split(',')
+        if replica.strip()
+    ]
+    for number, replica in enumerate(replicas, 1):
+        databases['replica_{}'.format(number)] = replica_database(
+            default, replica
+        )
+    return databases
+
+
+def get_search_backend(databases):
+    """
+    Значение SEARCH_BACKEND: таблица FTS5 создаётся миграцией только
+    в SQLite, для остальных баз — поиск через LIKE.
+    """
+    if databases['default']['ENGINE'] == ENGINES['sqlite']:
+        return 'posts.search.SQLiteFTSBackend'
+    return 'posts.search.SimpleSearchBackend'
@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 
 import os
 
+from .caches import get_caches
+from .database import get_databases, get_search_backend
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -43,10 +46,13 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -54,17 +60,26 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Разобранные шаблоны хранятся в памяти процесса; при отладке
+            # шаблоны читаются заново, чтобы правки были видны сразу
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -82,11 +97,32 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+# База и реплики из переменных окружения DB_*, см. yatube/database.py
+DATABASES = get_databases(BASE_DIR)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Модели этих приложений читаются с реплик, если они есть,
+# а их запись переключает пользователя на основную базу
+REPLICA_READ_APPS = {'posts'}
+# Представления, которые читают с реплик на GET и HEAD
+REPLICA_VIEWS = {
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:follow_index',
+}
+# Сколько секунд после записи пользователь читает из основной базы
+REPLICA_STICKY_SECONDS = 5
+REPLICA_STICKY_COOKIE = 'primary_until'
+
+# Выполняются при открытии каждого соединения с SQLite: журнал WAL
+# не блокирует чтение на время записи, synchronous=NORMAL синхронизирует
+# диск только при контрольной точке WAL, файл базы читается через mmap
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
 }
 
 
@@ -126,10 +162,24 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
-STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# Файлы оформления (css/, js/, img/) кладутся в yatube/static при
+# развёртывании; без каталога collectstatic собирает только статику admin
+STATICFILES_DIRS = [
+    path for path in [os.path.join(BASE_DIR, 'static')]
+    if os.path.isdir(path)
+]
 
 STATIC_URL = '/static/'
 
+# Куда collectstatic собирает файлы с хешем в имени и их варианты .gz/.br
+STATIC_ROOT = os.getenv(
+    'STATIC_ROOT', default=os.path.join(BASE_DIR, 'collected_static')
+)
+STATICFILES_STORAGE = 'core.static.CompressedManifestStaticFilesStorage'
+# Сколько секунд браузер хранит файл с хешем в имени и без него
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+STATIC_CACHE_MAX_AGE = 3600
+
 
 # Настройки авторизации
 LOGIN_URL = 'users:login'
@@ -144,9 +194,93 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Настройки кеширования
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+# Кто отдаёт загруженные файлы: 'django' — само приложение,
+# 'x-accel-redirect' — nginx, 'x-sendfile' — Apache или lighttpd
+MEDIA_SERVE_MODE = os.getenv('MEDIA_SERVE_MODE', default='django')
+# Внутренний location nginx с MEDIA_ROOT для X-Accel-Redirect
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Сколько секунд браузер и прокси хранят загруженный файл
+MEDIA_CACHE_MAX_AGE = 86400
+
+# Миниатюры, которые создаются заранее: при сохранении поста с новой
+# картинкой и командой warm_thumbnails. Должны совпадать с тегами
+# thumbnail в шаблонах, иначе sorl не найдёт их по ключу
+THUMBNAIL_PREGENERATE = [
+    ('960x339', {'crop': 'center', 'upscale': True}),
+]
+# Число потоков пула миниатюр; 0 — создавать сразу при сохранении
+THUMBNAIL_WORKERS = 2
+
+# Настройки кеширования: уровень кеша из переменной CACHE_TIER,
+# см. yatube/caches.py
+CACHES = get_caches(BASE_DIR)
+
+# Поисковый индекс постов: posts.search.SQLiteFTSBackend (FTS5)
+# для SQLite или posts.search.SimpleSearchBackend (LIKE) для других баз
+SEARCH_BACKEND = get_search_backend(DATABASES)
+# Сколько найденных постов можно пролистать
+SEARCH_MAX_RESULTS = 1000
+
+# Начиная с этого числа подписчиков посты автора не раскладываются
+# по лентам подписок, а читаются напрямую
+TIMELINE_FANOUT_LIMIT = 1000
+# Число потоков, раскладывающих посты автора по лентам, когда у него
+# стало меньше подписчиков, чем порог; 0 — сразу в запросе отписки
+TIMELINE_BACKFILL_WORKERS = 1
+
+# Адреса, с которых /core/metrics доступны без входа (сборщик
+# Prometheus), через пробел; остальным — только сотрудникам (is_staff)
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', default='').split()
+
+# Шаги прогрева процесса в wsgi.py и команде warmup (core/warmup.py)
+WARMUP_STEPS = {
+    'urls': 'core.warmup.warm_urls',
+    'admin': 'core.warmup.warm_admin',
+    'templates': 'core.warmup.warm_templates_step',
+    'thumbnails': 'core.warmup.warm_thumbnails',
+    'images': 'core.warmup.warm_images',
+    'i18n': 'core.warmup.warm_i18n',
+}
+
+# Сжатие ответов (core.middleware.CompressionMiddleware)
+COMPRESS_CONTENT_TYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson',
+    'image/svg+xml',
 }
+# Более короткие ответы не сжимаются: выигрыш меньше заголовков gzip
+COMPRESS_MIN_SIZE = 200
+COMPRESS_LEVEL = 6
+COMPRESS_BROTLI_QUALITY = 5
+# Сколько байт потокового ответа копится перед отправкой сжатой части
+COMPRESS_STREAM_FLUSH_SIZE = 16 * 1024
+# Убирать отступы шаблонов из HTML-ответов
+HTML_MINIFY = True
+
+# Отчёт прогрева при запуске процесса
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.warmup': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Очередь комментариев: add_comment ставит комментарий в очередь
+# процесса, и фоновый поток записывает их пачками в короткой транзакции.
+# Выключена — каждый комментарий записывается сразу
+COMMENT_QUEUE_ENABLED = os.getenv('COMMENT_QUEUE_ENABLED') == '1'
+# Сколько комментариев может ждать записи
+COMMENT_QUEUE_SIZE = 10000
+# Наибольшая пачка и сколько секунд поток добирает её
+COMMENT_QUEUE_BATCH_SIZE = 500
+COMMENT_QUEUE_FLUSH_INTERVAL = 0.05
+# Сколько секунд запрос ждёт места в полной очереди до ответа 503
+COMMENT_QUEUE_PUT_TIMEOUT = 1
@@ -13,11 +13,13 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include, re_path
-from django.views.static import serve
+
+from core.views import serve_media, serve_static
 
 
 urlpatterns = [
@@ -25,6 +27,8 @@ urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('core/', include('core.urls', namespace='core')),
+    path('api/', include('api.urls', namespace='api')),
     path('', include('posts.urls', namespace='posts')),
 ]
 
@@ -32,11 +36,15 @@ handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied_view'
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 urlpatterns += [
     re_path(
-        r'^media/(?P<path>.*)$',
-        serve,
-        {'document_root': settings.MEDIA_ROOT}
-    )
+        r'^{}(?P<path>.+)$'.format(re.escape(settings.MEDIA_URL.lstrip('/'))),
+        serve_media,
+        name='media'
+    ),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(re.escape(settings.STATIC_URL.lstrip('/'))),
+        serve_static,
+        name='static'
+    ),
 ]
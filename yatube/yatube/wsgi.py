@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Адреса, шаблоны, переводы и т. д. готовятся до первого запроса
+# (и до fork при gunicorn --preload). WARMUP=0 отключает прогрев,
+# WARMUP=urls,templates выполняет только перечисленные шаги WARMUP_STEPS
+WARMUP = os.getenv('WARMUP', '1')
+if WARMUP != '0':
+    from core.warmup import warm_up
+    warm_up(None if WARMUP == '1' else WARMUP.split(','))